@@ -0,0 +1,282 @@
+"""Benchmark cases, and the synthetic data they run on.
+
+Every case is a setup function that takes a size, builds its data, and
+returns the function to time. Data is generated with a fixed seed, so runs
+on different commits measure the same work.
+"""
+import csv
+import importlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from typing import Any, Callable
+
+import md_generator
+from md_generator import Document, Group, Heading, Paragraph, Table, Text, md_format
+from md_generator import csv_tools
+from md_generator.md_format import MDFormatter, parse_format_spec_part
+
+SEED = 1234
+
+SCALES = {
+    'small': 10,
+    'medium': 10_000,
+    'large': 1_000_000,
+}
+"""Number of cells (or fields, or specs) each case works on at each scale."""
+
+CASES: dict[str, tuple[Callable[[int], Callable[[], Any]], list[str]]] = {}
+
+_temporary_files: list[str] = []
+
+def case(name: str, scales: list[str] = list(SCALES)):
+    """Register a benchmark case.
+
+    Args:
+        name (str): Name of the case.
+        scales (list[str], optional): Scales to run it at. Defaults to every scale.
+    """
+    def register(setup: Callable[[int], Callable[[], Any]]):
+        CASES[name] = (setup, scales)
+        return setup
+
+    return register
+
+# data generators
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'pipe|cell', 'back\\slash', 'quote "q"', 'comma, here', '漢字', 'emoji 👍']
+
+def table_data(cells: int, columns: int = 10) -> tuple[list[str], list[list[str]]]:
+    """Get a header and rows with about `cells` cells in total.
+
+    Columns alternate between numbers, words and dates.
+    """
+    generator = random.Random(SEED)
+    columns = max(1, min(columns, cells))
+    header = [f'column_{index}' for index in range(columns)]
+
+    rows = []
+    for _ in range(max(1, cells // columns)):
+        row = []
+        for index in range(columns):
+            kind = index % 3
+            if kind == 0:
+                row.append(str(generator.randint(-1000, 100000)))
+            elif kind == 1:
+                row.append(' '.join(generator.choices(WORDS, k = generator.randint(1, 4))))
+            else:
+                row.append(f'20{generator.randint(10, 30)}-{generator.randint(1, 12):02}-{generator.randint(1, 28):02}')
+        rows.append(row)
+
+    return header, rows
+
+def csv_file(cells: int, columns: int = 10) -> str:
+    """Write a csv file with about `cells` cells, and get its path."""
+    header, rows = table_data(cells, columns)
+
+    file = tempfile.NamedTemporaryFile('w', suffix = '.csv', newline = '', encoding = 'utf-8', delete = False)
+    with file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    _temporary_files.append(file.name)
+    return file.name
+
+def nested_group(depth: int, width: int = 3) -> Group:
+    """Get groups nested `depth` deep, with `width` text items at each level."""
+    group = Group([Text(f'leaf {index}', bold = index % 2 == 0) for index in range(width)], separator = ' ')
+    for level in range(depth):
+        group = Group([Text(f'level {level}'), group, f'after {level}'], separator = ' ')
+    return group
+
+def template(fields: int) -> tuple[str, dict[str, Any]]:
+    """Get a template with `fields` fields using a mix of specs, and values for it."""
+    specs = ['', ':bold', ':italic', ':code', ':>8', ':link']
+    parts = []
+    values = {}
+
+    for index in range(fields):
+        name = f'field_{index}'
+        parts.append(f'{name} is {{{name}{specs[index % len(specs)]}}}')
+        values[name] = f'value_{index}' if index % 2 else index
+
+    return ', '.join(parts), values
+
+def format_specs(count: int) -> list[str]:
+    """Get `count` different format specs, like the ones used on tables."""
+    generator = random.Random(SEED)
+    specs = []
+
+    for index in range(count):
+        column = f'column_{generator.randint(0, 9)}'
+        specs.append(generator.choice([
+            f'sort={column}>:filter={column}=(a,b,c{index})',
+            f'order=({column},col_{index}=renamed)',
+            f'align=(left,right,center,{index % 3}):sort=({column}=num,other)',
+            f'transform=({column}={{{column}}}-{index}):compact',
+            f'link=https://example.com/{index}:title="quoted {index}"',
+        ]))
+
+    return specs
+
+# import
+
+HEAVY_MODULES = ['markdown', 'bs4', 'furl', 'charset_normalizer', 'concurrent.futures.process', 'multiprocessing']
+"""Modules that are only imported when they're first used."""
+
+IMPORT_TIME_BUDGET = 0.15
+"""Seconds `import md_generator` may take, as reported by `python -X importtime`."""
+
+@case('import', ['small'])
+def import_package(size: int):
+    # in a new interpreter, so the modules aren't already loaded
+    environment = dict(os.environ, PYTHONPATH = os.path.dirname(os.path.dirname(md_generator.__file__)))
+    code = f'import sys, md_generator; print(*[name for name in {HEAVY_MODULES!r} if name in sys.modules])'
+
+    def run():
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            env = environment, capture_output = True, text = True, check = True,
+        )
+        loaded = result.stdout.split()
+        if loaded:
+            raise AssertionError(f'importing md_generator imported {", ".join(loaded)}')
+
+        # lines look like `import time: self [us] | cumulative | name`
+        for line in result.stderr.splitlines():
+            fields = line.removeprefix('import time:').split('|')
+            if len(fields) == 3 and fields[2].strip() == 'md_generator':
+                seconds = int(fields[1]) / 1e6
+                if seconds > IMPORT_TIME_BUDGET:
+                    raise AssertionError(f'importing md_generator took {seconds * 1000:.0f}ms, more than {IMPORT_TIME_BUDGET * 1000:.0f}ms')
+
+    return run
+
+# md_format
+
+SPEC_CACHES = ['parse_format_spec_part_frozen', 'parse_format_spec_frozen', 'compile_field_spec']
+"""Caches in `md_format` that hold parsed specs."""
+
+def spec_cache_clearer() -> Callable[[], None]:
+    """Get a function that clears the spec caches, so a case times the parser
+    instead of cache hits. Does nothing on commits without the caches."""
+    module = importlib.import_module('md_generator.md_format')
+    clears = [getattr(module, name).cache_clear for name in SPEC_CACHES if hasattr(getattr(module, name, None), 'cache_clear')]
+
+    def clear():
+        for clear_cache in clears:
+            clear_cache()
+
+    return clear
+
+def parse_specs(specs: list[str], clear: Callable[[], None] | None = None) -> Callable[[], None]:
+    def run():
+        for spec in specs:
+            rest = spec
+            while rest:
+                if clear:
+                    clear()
+                _, rest = parse_format_spec_part(rest)
+
+    return run
+
+def format_fields(size: int, clear: Callable[[], None] | None = None) -> Callable[[], None]:
+    formatter = MDFormatter()
+    fields = [
+        [('text', 'bold'), ('text', 'code'), (42, '>8'), ('docs/page.md', 'link'), ('3.5', 'num:.2f')][index % 5]
+        for index in range(size)
+    ]
+
+    def run():
+        for value, spec in fields:
+            if clear:
+                clear()
+            formatter.format_field(value, spec)
+
+    return run
+
+@case('md_format.parse_format_spec_part')
+def parse_spec(size: int):
+    return parse_specs(format_specs(size), spec_cache_clearer())
+
+@case('md_format.parse_format_spec_part.cached')
+def parse_spec_cached(size: int):
+    return parse_specs(format_specs(size))
+
+@case('md_format.format_field')
+def format_field(size: int):
+    return format_fields(size, spec_cache_clearer())
+
+@case('md_format.format_field.cached')
+def format_field_cached(size: int):
+    return format_fields(size)
+
+@case('md_format.many_fields', ['small', 'medium'])
+def many_fields(size: int):
+    text, values = template(size)
+    return lambda: md_format(text, **values)
+
+# tables
+
+@case('table.write')
+def table_write(size: int):
+    header, rows = table_data(size)
+    table = Table(header, rows)
+    return table.write
+
+@case('table.format')
+def table_format(size: int):
+    header, rows = table_data(size)
+    table = Table(header, rows)
+    spec = 'sort=column_3,column_0>:transform=column_1={column_1} ({column_0}):filter=column_4=alpha'
+    return lambda: format(table, spec)
+
+@case('table.format.typed_sort')
+def table_format_typed_sort(size: int):
+    # typed sort keys are newer than the rest of the spec syntax, so they get
+    # their own case, and older commits only skip this one
+    header, rows = table_data(size)
+    table = Table(header, rows)
+    spec = 'sort=column_2=date,column_0=num>'
+    return lambda: format(table, spec)
+
+@case('group.nested', ['small', 'medium'])
+def group_nested(size: int):
+    # one level per 100 cells, so the medium scale stays inside the recursion limit
+    group = nested_group(max(1, size // 100))
+    return lambda: str(group)
+
+# csv
+
+@case('csv.load_csv')
+def load_csv(size: int):
+    path = csv_file(size)
+    return lambda: csv_tools.load_csv(path)
+
+@case('csv.aligned_csv')
+def aligned_csv(size: int):
+    header, rows = table_data(size)
+    table = [header] + rows
+    return lambda: csv_tools.aligned_csv(table)
+
+# html
+
+@case('document.to_html', ['small', 'medium'])
+def document_to_html(size: int):
+    header, rows = table_data(size)
+    document = Document([
+        Heading('Report'),
+        Paragraph([Text('Generated ', italic = True), 'for the benchmark.']),
+        Table(header, rows),
+    ])
+    return document.to_html
+
+def cleanup():
+    """Remove files made by the generators."""
+    for path in _temporary_files:
+        if os.path.exists(path):
+            os.remove(path)
+    _temporary_files.clear()
@@ -0,0 +1,264 @@
+"""Run the benchmarks, and compare results.
+
+    python benchmarks/run.py run [--scale small medium] [--case table] [-o results.json]
+    python benchmarks/run.py compare old.json new.json [--threshold 0.1]
+    python benchmarks/run.py commits <old commit> <new commit> [--scale ...]
+
+`run` writes the timings to a json file. `compare` flags cases that got
+slower than the threshold between two result files, or that fail in the
+new one but didn't in the old one, and exits with 1 if any did. `commits` checks out both commits in temporary git worktrees, runs
+this suite against each, and compares them.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+MIN_TIME = 0.2
+"""Each repeat calls the case enough times to take at least this long, in seconds."""
+
+def time_case(run: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    """Time a function, like `timeit`.
+
+    Args:
+        run (Callable[[], Any]): Function to time.
+        repeat (int): Number of times to repeat the measurement.
+
+    Returns:
+        dict[str, Any]: seconds per call for each repeat, with the min and median
+    """
+    # find how many calls make a measurement long enough to be reliable
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        loops = loops * 10 if elapsed < MIN_TIME / 10 else loops * 2
+
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter() - start) / loops)
+
+    return {
+        'loops': loops,
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+    }
+
+def git_commit(path: str) -> str | None:
+    try:
+        return subprocess.run(
+            ['git', '-C', path, 'rev-parse', 'HEAD'],
+            capture_output = True, text = True, check = True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(scales: list[str], names: list[str], repeat: int) -> dict[str, Any]:
+    """Run the cases that match `names` at each scale.
+
+    Args:
+        scales (list[str]): Scales to run.
+        names (list[str]): Only run cases whose name contains one of these. Runs every case if empty.
+        repeat (int): Number of measurements per case.
+
+    Returns:
+        dict[str, Any]: results, keyed by `case[scale]`
+    """
+    import cases
+
+    results = {}
+
+    try:
+        for name, (setup, case_scales) in cases.CASES.items():
+            if names and not any(part in name for part in names):
+                continue
+
+            for scale in scales:
+                if scale not in case_scales:
+                    continue
+
+                key = f'{name}[{scale}]'
+                print(f'{key} ...', end = ' ', file = sys.stderr, flush = True)
+
+                try:
+                    run = setup(cases.SCALES[scale])
+                    result = time_case(run, repeat)
+                except Exception as e:
+                    result = {'error': f'{type(e).__name__}: {e}'}
+
+                results[key] = result
+                if 'error' in result:
+                    print(result['error'], file = sys.stderr)
+                else:
+                    print(f"{format_time(result['median'])} ({result['loops']} loops)", file = sys.stderr)
+    finally:
+        cases.cleanup()
+
+    return results
+
+def format_time(seconds: float) -> str:
+    for unit, size in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= size:
+            return f'{seconds / size:.3g}{unit}'
+    return f'{seconds / 1e-9:.3g}ns'
+
+def compare(old: dict[str, Any], new: dict[str, Any], threshold: float) -> list[str]:
+    """Compare two result files, and print a table of the changes.
+
+    Args:
+        old (dict[str, Any]): Results to compare against.
+        new (dict[str, Any]): New results.
+        threshold (float): How much slower a case can get before it counts as a regression, like 0.1 for 10%.
+
+    Returns:
+        list[str]: cases that got slower, or started failing
+    """
+    regressions = []
+    old_results = old['results']
+    new_results = new['results']
+
+    print(f"{'case':<45} {'old':>10} {'new':>10} {'change':>8}")
+    for key in sorted(set(old_results) | set(new_results)):
+        old_result = old_results.get(key, {})
+        new_result = new_results.get(key, {})
+
+        if 'error' in new_result and 'median' in old_result:
+            # the case worked before, so the error is a regression too
+            print(f'{key:<45} {format_time(old_result["min"]):>10} {"error":>10} {"-":>8}  REGRESSION')
+            regressions.append(key)
+            continue
+        
+        if 'median' not in old_result or 'median' not in new_result:
+            print(f'{key:<45} {"-":>10} {"-":>10} {"skipped":>8}')
+            continue
+
+        # the min is the least noisy estimate of how fast the code can run
+        ratio = new_result['min'] / old_result['min']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 / (1 + threshold):
+            flag = '  faster'
+
+        print(f"{key:<45} {format_time(old_result['min']):>10} {format_time(new_result['min']):>10} {ratio - 1:>+8.1%}{flag}")
+
+    return regressions
+
+def run_at_commit(commit: str, arguments: list[str]) -> dict[str, Any]:
+    """Run this suite against the code at a commit.
+
+    Args:
+        commit (str): Commit to check out in a temporary worktree.
+        arguments (list[str]): Extra arguments for `run`.
+
+    Returns:
+        dict[str, Any]: results
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = os.path.join(directory, 'worktree')
+        output = os.path.join(directory, 'results.json')
+
+        subprocess.run(['git', '-C', REPO_DIR, 'worktree', 'add', '--detach', worktree, commit], check = True)
+        try:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), 'run', '--src', os.path.join(worktree, 'src'), '--output', output, *arguments],
+                check = True,
+            )
+        finally:
+            subprocess.run(['git', '-C', REPO_DIR, 'worktree', 'remove', '--force', worktree], check = True)
+
+        with open(output, encoding = 'utf-8') as file:
+            return json.load(file)
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description = 'md_generator benchmarks')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    def add_run_arguments(command: argparse.ArgumentParser):
+        command.add_argument('--scale', nargs = '+', default = ['small', 'medium'], choices = ['small', 'medium', 'large'], help = 'scales to run (default: small medium)')
+        command.add_argument('--case', nargs = '+', default = [], help = 'only run cases whose name contains one of these')
+        command.add_argument('--repeat', type = int, default = 5, help = 'measurements per case (default: 5)')
+
+    run_command = commands.add_parser('run', help = 'run the benchmarks')
+    add_run_arguments(run_command)
+    run_command.add_argument('--output', '-o', help = 'json file to write the results to')
+    run_command.add_argument('--src', default = os.path.join(REPO_DIR, 'src'), help = 'directory to import md_generator from')
+
+    compare_command = commands.add_parser('compare', help = 'compare two result files')
+    compare_command.add_argument('old')
+    compare_command.add_argument('new')
+    compare_command.add_argument('--threshold', type = float, default = 0.1, help = 'slowdown that counts as a regression (default: 0.1)')
+
+    commits_command = commands.add_parser('commits', help = 'run and compare two commits')
+    commits_command.add_argument('old')
+    commits_command.add_argument('new')
+    commits_command.add_argument('--threshold', type = float, default = 0.1, help = 'slowdown that counts as a regression (default: 0.1)')
+    add_run_arguments(commits_command)
+
+    args = parser.parse_args(arguments)
+
+    if args.command == 'run':
+        sys.path.insert(0, os.path.abspath(args.src))
+        sys.path.insert(0, BENCHMARKS_DIR)
+
+        results = {
+            'meta': {
+                'commit': git_commit(args.src),
+                'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'scales': args.scale,
+                'repeat': args.repeat,
+            },
+            'results': run_benchmarks(args.scale, args.case, args.repeat),
+        }
+
+        text = json.dumps(results, indent = 2)
+        if args.output:
+            with open(args.output, 'w', encoding = 'utf-8') as file:
+                file.write(text)
+        else:
+            print(text)
+        return 0
+
+    if args.command == 'compare':
+        with open(args.old, encoding = 'utf-8') as file:
+            old = json.load(file)
+        with open(args.new, encoding = 'utf-8') as file:
+            new = json.load(file)
+    else:
+        run_arguments = ['--scale', *args.scale, '--repeat', str(args.repeat)]
+        if args.case:
+            run_arguments += ['--case', *args.case]
+
+        old = run_at_commit(args.old, run_arguments)
+        new = run_at_commit(args.new, run_arguments)
+
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s): {", ".join(regressions)}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,7 @@ __author__ = "ego-lay-atman-bay"
 from .components.base import BaseBlockNode, BaseNode
 from .components.blockquote import BlockQuote
 from .components.codeblock import CodeBlock
-from .components.document import Document
+from .components.document import Document, render_many, to_html_many
 from .components.group import Group
 from .components.heading import Heading
 from .components.horizontalrule import HorizontalRule
@@ -18,7 +18,7 @@ from .components.paragraph import Paragraph
 from .components.sentence import Sentence
 from .components.table import Table
 from .components.text import Text
-from .md_format import md_format
+from .md_format import compile_template, md_format
 
 __all__ = [
     "BaseNode",
@@ -39,4 +39,7 @@ __all__ = [
     "NewLine",
     "HorizontalRule",
     "md_format",
+    "compile_template",
+    "render_many",
+    "to_html_many",
 ]
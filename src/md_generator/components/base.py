@@ -1,16 +1,298 @@
 from abc import abstractmethod
+from contextlib import contextmanager
+import html
+import io
+import weakref
+from typing import IO, Any, Callable, Iterator
 
 from copy import deepcopy
 
+class _LinePrefix():
+    def __init__(self, write: Callable[[str], None], prefix: Callable[[str], str], keep_trailing_newline: bool = True) -> None:
+        self.write_parent = write
+        self.prefix = prefix
+        self.keep_trailing_newline = keep_trailing_newline
+        self.line: list[str] = []
+        # the newline after a line is only written once the next line starts,
+        # so it can be dropped at the end
+        self.newline = False
+    
+    def write(self, text: str):
+        while text:
+            index = text.find('\n')
+            if index < 0:
+                self.line.append(text)
+                return
+            
+            self.line.append(text[:index])
+            text = text[index + 1:]
+            self._write_line()
+            self.newline = True
+    
+    def _write_line(self):
+        line = ''.join(self.line)
+        self.line = []
+        
+        if self.newline:
+            self.write_parent('\n')
+        self.write_parent(self.prefix(line))
+    
+    def close(self):
+        if any(self.line):
+            self._write_line()
+            self.newline = False
+        
+        if self.newline and self.keep_trailing_newline:
+            self.write_parent('\n')
+
+class Sink():
+    """Where nodes write their text to.
+    
+    Wraps a file (anything with a `write()` method, like `io.StringIO` or
+    `socket.makefile('w')`), and keeps track of prefixes that have to be
+    added to each line, like the `> ` in block quotes. Only the current line
+    is kept in memory while a prefix is active.
+    """
+    def __init__(self, file: IO[str]) -> None:
+        self.file = file
+        self._prefixes: list[_LinePrefix] = []
+    
+    def write(self, text: str):
+        if self._prefixes:
+            self._prefixes[-1].write(text)
+        else:
+            self.file.write(text)
+    
+    def write_node(self, node: "BaseNode | object"):
+        """Write a node the same way `str(node)` would.
+        
+        Args:
+            node (BaseNode | object): Node to write. Anything else is written as `str(node)`.
+        """
+        if isinstance(node, BaseNode):
+            if node.block:
+                self.write('\n')
+            if node.cache_render:
+                self.write(node._write_cached())
+            else:
+                node._write_to(self)
+            if node.block:
+                self.write('\n')
+        else:
+            self.write(str(node))
+    
+    @contextmanager
+    def prefix(self, prefix: Callable[[str], str], keep_trailing_newline: bool = True) -> Iterator["Sink"]:
+        """Transform every line written inside this context.
+        
+        Args:
+            prefix (Callable[[str], str]): Function that takes a line (without the newline), and returns the line with the prefix.
+            keep_trailing_newline (bool, optional): Whether to keep the newline at the very end. Defaults to True.
+        """
+        if self._prefixes:
+            parent = self._prefixes[-1].write
+        else:
+            parent = self.file.write
+        
+        level = _LinePrefix(parent, prefix, keep_trailing_newline)
+        self._prefixes.append(level)
+        try:
+            yield self
+        finally:
+            self._prefixes.pop()
+            level.close()
+
+class HTMLSink():
+    """Where nodes write their html to.
+    
+    Wraps a file, like `Sink`. With `use_ia`, tables get the classes and
+    styles used on the Internet Archive while they're written.
+    """
+    def __init__(self, file: IO[str], use_ia: bool = False) -> None:
+        self.file = file
+        self.use_ia = use_ia
+    
+    def write(self, text: str):
+        """Write html as is."""
+        self.file.write(text)
+    
+    def write_text(self, text: str):
+        """Write text, escaping it for html."""
+        self.file.write(html.escape(str(text), quote = False))
+    
+    def write_node(self, node: "BaseNode | object"):
+        """Write a node as html. Anything else is written as text.
+        
+        Args:
+            node (BaseNode | object): Node to write.
+        """
+        if isinstance(node, BaseNode):
+            node._write_html(self)
+        else:
+            self.write_text(node)
+    
+    def open_tag(self, tag: str, attributes: dict[str, Any] | None = None):
+        """Write an opening tag. Attributes that are None or empty are left out.
+        
+        Args:
+            tag (str): tag name
+            attributes (dict[str, Any] | None, optional): Attributes of the tag. Defaults to None.
+        """
+        self.file.write(f'<{tag}')
+        if attributes:
+            for name, value in attributes.items():
+                if value != None and value != '':
+                    self.file.write(f' {name}="{html.escape(str(value))}"')
+        self.file.write('>')
+    
+    def close_tag(self, tag: str):
+        self.file.write(f'</{tag}>')
+
+def render(write_to: Callable[[Sink], None]) -> str:
+    """Render into a string using a `_write_to()` method.
+    
+    Args:
+        write_to (Callable[[Sink], None]): function that writes to a sink
+    
+    Returns:
+        str: written text
+    """
+    file = io.StringIO()
+    write_to(Sink(file))
+    return file.getvalue()
+
 class BaseNode():
     block: bool = False
+    cache_render: bool = False
+    """Keep the output of `write()` until this node, or anything in it, changes."""
     
     @abstractmethod
     def write(self) -> str:
         return ""
     
+    def _set_and_invalidate(self, name: str, value) -> None:
+        # `__setattr__` of every node once a render has been cached. Until
+        # then there's nothing to invalidate, so setting attributes doesn't
+        # go through Python code.
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            self.invalidate()
+    
+    def invalidate(self):
+        """Clear the cached render of this node and every node it is in.
+        
+        This is done automatically when attributes change, or items are
+        added to or removed from a group. Call it after changing something
+        in place, like a row of a table.
+        """
+        state = self.__dict__
+        state.pop('_render_cache', None)
+        
+        parents = state.get('_parents')
+        if parents:
+            for parent in list(parents.values()):
+                parent.invalidate()
+    
+    def _children(self) -> Iterator["BaseNode"]:
+        # nodes directly inside this one
+        for value in self.__dict__.values():
+            if isinstance(value, BaseNode):
+                yield value
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    if isinstance(item, BaseNode):
+                        yield item
+    
+    def _adopt_children(self):
+        # Let every node inside this one invalidate it when it changes. This
+        # is only done when a render gets cached, so nodes that are never
+        # cached don't keep track of their parents. Nodes added later are
+        # adopted the next time the render is cached, since adding them
+        # clears the cache.
+        seen = {id(self)}
+        stack = [self]
+        
+        while stack:
+            node = stack.pop()
+            for child in node._children():
+                parents = child.__dict__.get('_parents')
+                if parents == None:
+                    parents = child._parents = weakref.WeakValueDictionary()
+                parents[id(node)] = node
+                
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+    
+    def _write_cached(self) -> str:
+        if not self.cache_render:
+            return self.write()
+        
+        text = self.__dict__.get('_render_cache')
+        if text == None:
+            if BaseNode.__setattr__ is not BaseNode._set_and_invalidate:
+                BaseNode.__setattr__ = BaseNode._set_and_invalidate
+            
+            text = self.write()
+            self._adopt_children()
+            self._render_cache = text
+        return text
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_parents', None)
+        state.pop('_render_cache', None)
+        return state
+    
+    def write_to(self, file: IO[str] | Sink):
+        """Write the same text as `write()` to a file, without building the whole string first.
+        
+        Args:
+            file (IO[str] | Sink): file to write to
+        """
+        if not isinstance(file, Sink):
+            file = Sink(file)
+        self._write_to(file)
+    
+    def _write_to(self, sink: Sink):
+        # nodes with children override this to write them straight to the sink
+        sink.write(self.write())
+    
+    def write_html(self, file: IO[str] | HTMLSink, use_ia: bool = False):
+        """Write the node as html, without going through markdown.
+        
+        Plain strings in the node are written as text, so markdown in them
+        isn't converted.
+        
+        Args:
+            file (IO[str] | HTMLSink): file to write to
+            use_ia (bool, optional): Style tables for the Internet Archive. Defaults to False.
+        """
+        if not isinstance(file, HTMLSink):
+            file = HTMLSink(file, use_ia)
+        self._write_html(file)
+    
+    def to_html(self, use_ia: bool = False) -> str:
+        """Render the node as html, without going through markdown. See `write_html()`.
+        
+        Args:
+            use_ia (bool, optional): Style tables for the Internet Archive. Defaults to False.
+        
+        Returns:
+            str: html
+        """
+        file = io.StringIO()
+        self.write_html(file, use_ia)
+        return file.getvalue()
+    
+    def _write_html(self, sink: HTMLSink):
+        # nodes without their own html go through the markdown library
+        import markdown
+        
+        sink.write(markdown.markdown(str(self), extensions = ['tables', 'fenced_code']))
+    
     def __str__(self) -> str:
-        text = self.write()
+        text = self._write_cached()
         if self.block:
             text = f'\n{text}\n'
         return text
@@ -1,18 +1,20 @@
+from .base import HTMLSink, Sink
 from .group import Group
 
+def quote_line(line: str) -> str:
+    if line.startswith('>') or line == '':
+        return f'>{line}'
+    else:
+        return f'> {line}'
+
 class BlockQuote(Group):
     block = True
     
-    def write(self) -> str:
-        lines = []
-        text = super().write()
-        
-        for line in text.splitlines():
-            if line.startswith('>'):
-                lines.append(f'>{line}')
-            elif line == '':
-                lines.append(f'>')
-            else:
-                lines.append(f'> {line}')
-        
-        return '\n'.join(lines)
+    def _write_to(self, sink: Sink):
+        with sink.prefix(quote_line, keep_trailing_newline = False):
+            super()._write_to(sink)
+    
+    def _write_html(self, sink: HTMLSink):
+        sink.write('<blockquote>\n')
+        self._write_html_blocks(sink, self.separator)
+        sink.write('</blockquote>')
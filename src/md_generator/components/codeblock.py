@@ -1,3 +1,4 @@
+from .base import HTMLSink, Sink, render
 from .lines import Lines
 from ..utils import backtick_count
 
@@ -9,7 +10,7 @@ class CodeBlock(Lines):
         self.lang = lang
     
     def write(self) -> str:
-        contents = super().write()
+        contents = render(super()._write_to)
         
         num_ticks = backtick_count(contents, 3)
         
@@ -20,3 +21,13 @@ class CodeBlock(Lines):
         result += '`' * num_ticks
         
         return result
+    
+    def _write_to(self, sink: Sink):
+        # the fence depends on the contents, so they have to be rendered first
+        sink.write(self.write())
+    
+    def _write_html(self, sink: HTMLSink):
+        sink.write('<pre>')
+        sink.open_tag('code', {'class': f'language-{self.lang}' if self.lang else None})
+        sink.write_text(render(super()._write_to) + '\n')
+        sink.write('</code></pre>')
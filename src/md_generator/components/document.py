@@ -1,52 +1,220 @@
+from typing import Any, Iterable
+
+from .base import BaseNode, HTMLSink, Sink, render
 from .lines import Lines
-import markdown
-import bs4
+from .table import Table
 
 class Document(Lines):
     block = True
     
-    def write(self) -> str:
-        return '\n\n'.join([str(section) for section in self])
-    
-    def to_html(self, use_ia = False) -> str:
-        table_style = 'margin-bottom: 0; word-break: auto-phrase;'
-        table_cell_style = 'word-break: auto-phrase;'
-        table_header_style = 'background: #edecec;'
-        code_style = 'padding: .2em .4em;; background-color: #e5e5e5; border-radius: 6px; white-space: break-spaces;'
-        code_block_style = 'padding: 16px; line-height: 1.45; background-color: #f6f8fa; border-radius: 6px;'
+    def write(self, parallel: int | None = None) -> str:
+        """Render the document.
 
+        Args:
+            parallel (int | None, optional): Number of processes to render the sections in. Defaults to None.
+
+        Returns:
+            str: markdown
+        """
+        if parallel and parallel > 1 and len(self) > 1:
+            return render_many([self], workers = parallel)[0]
         
-        html = markdown.markdown(str(self), extensions = ['tables', 'fenced_code'])
-
-        soup = bs4.BeautifulSoup(html, 'html.parser')
-        # for code in soup.find_all('code'):
-        #     if code.parent.name == 'pre':
-        #         continue
-        #     
-        #     code['style'] = code.get('style', '') + code_style
-        
-        # for code in soup.find_all('pre'):
-        #     code['style'] = code.get('style', '') + code_block_style
+        return render(self._write_to)
+    
+    def _write_to(self, sink: Sink):
+        self._write_parts(sink, '\n\n')
+    
+    def _join_sections(self, sections: list[str]) -> str:
+        return '\n\n'.join(sections)
+    
+    def _write_html(self, sink: HTMLSink):
+        self._write_html_blocks(sink, None)
+    
+    def to_html(self, use_ia = False, native: bool = False) -> str:
+        """Render the document as html.
+
+        Args:
+            use_ia (bool, optional): Style tables for the Internet Archive. Defaults to False.
+            native (bool, optional): Write the html straight from the nodes (see `write_html()`), instead of converting the markdown. Plain strings aren't parsed as markdown. Defaults to False.
+
+        Returns:
+            str: html
+        """
+        if native:
+            return super().to_html(use_ia)
         
-        if use_ia:
-            for table in soup.find_all('table'):
-                table.wrap(soup.new_tag('div', attrs = {'class': 'ui-accordion', 'style': 'margin-bottom: 20px;'}))
-                table.wrap(soup.new_tag('div', attrs = {'class': 'ui-accordion-content table-responsive', 'style': 'padding: 0; border-top: 0;'}))
-                
-                table['style'] = table.get('style', '') + table_style
-                table['class'] = 'table table-bordered table-striped table-hover'
-                # table['stye'] = 'margin-bottom: revert;'
+        return _style_html(_convert_markdown(str(self)), use_ia)
+    
+    IA_CSS = "https://archive.org/includes/build/css/archive.min.css"
+
+
+_markdown_engines = None
+
+def _convert_markdown(text: str) -> str:
+    # Building a Markdown instance loads the extensions, so one instance is
+    # kept per thread, and reset between documents. Instances can't be
+    # shared between threads.
+    global _markdown_engines
+    
+    if _markdown_engines == None:
+        import threading
         
-        # for table in soup.find_all('thead'):
-            # table['style'] = 'font-family: "Helvetica Neue", Helvetica, Arial, sans-serif;'
+        _markdown_engines = threading.local()
+    
+    engine = getattr(_markdown_engines, 'engine', None)
+    
+    if engine == None:
+        # imported here so importing md_generator stays fast
+        import markdown
         
-        if use_ia:
-            for cell in soup.css.select('th, td'):
-                cell['style'] = cell.get('style', '') + table_cell_style
-                # cell['style'] = 'font-family: "Helvetica Neue", Helvetica, Arial, sans-serif;'
+        engine = _markdown_engines.engine = markdown.Markdown(extensions = ['tables', 'fenced_code'])
+    
+    return engine.reset().convert(text)
+
+def _style_html(html: str, use_ia: bool = False) -> str:
+    import bs4
+    
+    table_style = Table.IA_TABLE_STYLE
+    table_cell_style = Table.IA_CELL_STYLE
+    table_header_style = 'background: #edecec;'
+    code_style = 'padding: .2em .4em;; background-color: #e5e5e5; border-radius: 6px; white-space: break-spaces;'
+    code_block_style = 'padding: 16px; line-height: 1.45; background-color: #f6f8fa; border-radius: 6px;'
+    
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    # for code in soup.find_all('code'):
+    #     if code.parent.name == 'pre':
+    #         continue
+    #     
+    #     code['style'] = code.get('style', '') + code_style
+    
+    # for code in soup.find_all('pre'):
+    #     code['style'] = code.get('style', '') + code_block_style
+    
+    if use_ia:
+        for table in soup.find_all('table'):
+            table.wrap(soup.new_tag('div', attrs = {'class': 'ui-accordion', 'style': 'margin-bottom: 20px;'}))
+            table.wrap(soup.new_tag('div', attrs = {'class': 'ui-accordion-content table-responsive', 'style': 'padding: 0; border-top: 0;'}))
+            
+            table['style'] = table.get('style', '') + table_style
+            table['class'] = Table.IA_TABLE_CLASS
+            # table['stye'] = 'margin-bottom: revert;'
+    
+    # for table in soup.find_all('thead'):
+        # table['style'] = 'font-family: "Helvetica Neue", Helvetica, Arial, sans-serif;'
+    
+    if use_ia:
+        for cell in soup.css.select('th, td'):
+            cell['style'] = cell.get('style', '') + table_cell_style
+            # cell['style'] = 'font-family: "Helvetica Neue", Helvetica, Arial, sans-serif;'
+    
+    output_html = soup.decode(formatter = 'html5')
+    
+    return output_html
+
+
+def _pickle(value: Any) -> bytes | None:
+    # Pickled here instead of by the executor, so a value that can't be sent
+    # to another process can be told apart from an error while rendering it.
+    # None if it can't be pickled.
+    import pickle
+    
+    try:
+        return pickle.dumps(value)
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+        return None
+
+def _render_section(section: bytes) -> str:
+    import pickle
+    
+    return str(pickle.loads(section))
+
+def render_many(documents: Iterable[Document], workers: int | None = None) -> list[str]:
+    """Render documents, rendering their sections in a process pool.
+    
+    Sections are rendered in separate processes, and put back together in
+    order. Sections that can't be sent to another process (like lazy tables
+    that have been filtered or sorted) are rendered in this process instead.
+    Errors raised while rendering a section are raised here.
+
+    Args:
+        documents (Iterable[Document]): Documents to render.
+        workers (int | None, optional): Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        list[str]: rendered documents, in the same order
+    """
+    # imported here, since it imports multiprocessing, which is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    
+    documents = list(documents)
+    
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = []
+        for document in documents:
+            document_futures = []
+            for section in document:
+                data = _pickle(section) if isinstance(section, BaseNode) else None
+                document_futures.append(executor.submit(_render_section, data) if data != None else None)
+            futures.append(document_futures)
         
-        output_html = soup.decode(formatter = 'html5')
+        results = []
+        for document, document_futures in zip(documents, futures):
+            sections = [
+                future.result() if future != None else str(section)
+                for section, future in zip(document, document_futures)
+            ]
+            results.append(document._join_sections(sections))
+    
+    return results
+
+def _pickled_document_to_html(document: bytes, use_ia: bool = False, native: bool = False) -> str:
+    import pickle
+    
+    return _document_to_html(pickle.loads(document), use_ia, native)
+
+def _document_to_html(document: Document, use_ia: bool = False, native: bool = False) -> str:
+    if native:
+        return document.to_html(use_ia, native = True)
+    
+    html = _convert_markdown(str(document))
+    if use_ia:
+        html = _style_html(html, use_ia)
+    return html
+
+def to_html_many(documents: Iterable[Document], workers: int | None = None, use_ia: bool = False, native: bool = False) -> list[str]:
+    """Convert documents to html in a process pool.
+    
+    Each process keeps one markdown converter for all the documents it
+    converts. Without `use_ia`, the html from markdown is returned as is,
+    without going through BeautifulSoup like `Document.to_html()` does.
+    Documents that can't be sent to another process are converted in this
+    process instead. Errors raised while converting are raised here.
+
+    Args:
+        documents (Iterable[Document]): Documents to convert.
+        workers (int | None, optional): Number of processes. Defaults to the number of CPUs.
+        use_ia (bool, optional): Style tables for the Internet Archive. Defaults to False.
+        native (bool, optional): Write the html straight from the nodes. See `Document.to_html()`. Defaults to False.
+
+    Returns:
+        list[str]: html of each document, in the same order
+    """
+    documents = list(documents)
+    
+    if workers == 1:
+        return [_document_to_html(document, use_ia, native) for document in documents]
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = []
+        for document in documents:
+            data = _pickle(document)
+            futures.append(executor.submit(_pickled_document_to_html, data, use_ia, native) if data != None else None)
         
-        return output_html
+        results = [
+            future.result() if future != None else _document_to_html(document, use_ia, native)
+            for document, future in zip(documents, futures)
+        ]
     
-    IA_CSS = "https://archive.org/includes/build/css/archive.min.css"
+    return results
@@ -1,7 +1,7 @@
 from typing import Iterable, overload
 
 from ..md_format import parse_format_spec, parse_format_spec_part, md_format
-from .base import BaseNode
+from .base import BaseNode, HTMLSink, Sink, render
 # from .text import Text
 
 
@@ -25,7 +25,57 @@ class Group(BaseNode, list):
         self.separator = str(separator)
         
     def write(self) -> str:
-        return self.separator.join([str(part) for part in self])
+        return render(self._write_to)
+    
+    def _children(self):
+        yield from super()._children()
+        for item in self:
+            if isinstance(item, BaseNode):
+                yield item
+    
+    def _write_to(self, sink: Sink):
+        self._write_parts(sink, self.separator)
+    
+    def _write_parts(self, sink: Sink, separator: str):
+        for index, part in enumerate(self):
+            if index:
+                sink.write(separator)
+            sink.write_node(part)
+    
+    def _write_html(self, sink: HTMLSink):
+        for index, part in enumerate(self):
+            if index:
+                sink.write_text(self.separator)
+            sink.write_node(part)
+    
+    def _write_html_blocks(self, sink: HTMLSink, separator: str | None):
+        # Block parts are written as they are, and the inline parts between
+        # them go in paragraphs. If separator is None, every inline part gets
+        # its own paragraph.
+        in_paragraph = False
+        
+        for part in self:
+            if isinstance(part, BaseNode) and part.block:
+                if in_paragraph:
+                    sink.write('</p>\n')
+                    in_paragraph = False
+                sink.write_node(part)
+                sink.write('\n')
+                continue
+            
+            if in_paragraph:
+                sink.write_text(separator)
+            else:
+                sink.write('<p>')
+                in_paragraph = True
+            sink.write_node(part)
+            
+            if separator == None:
+                sink.write('</p>\n')
+                in_paragraph = False
+        
+        if in_paragraph:
+            sink.write('</p>\n')
     
     @classmethod
     def from_str(cls, string: str, separator: str = ';'):
@@ -34,26 +84,75 @@ class Group(BaseNode, list):
     def __add__(self, value):
         return Group(list.__add__(self, value))
     
+    # list methods that change the group have to clear the render cache
+    
+    def append(self, item):
+        list.append(self, item)
+        self.invalidate()
+    
+    def extend(self, items: Iterable):
+        list.extend(self, items)
+        self.invalidate()
+    
+    def insert(self, index: int, item):
+        list.insert(self, index, item)
+        self.invalidate()
+    
+    def remove(self, item):
+        list.remove(self, item)
+        self.invalidate()
+    
+    def pop(self, index: int = -1):
+        item = list.pop(self, index)
+        self.invalidate()
+        return item
+    
+    def clear(self):
+        list.clear(self)
+        self.invalidate()
+    
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.invalidate()
+    
+    def reverse(self):
+        list.reverse(self)
+        self.invalidate()
+    
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self.invalidate()
+    
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.invalidate()
+    
+    def __iadd__(self, value):
+        self.extend(value)
+        return self
+    
+    def __imul__(self, value):
+        list.__imul__(self, value)
+        self.invalidate()
+        return self
+    
     def __format__(self, format_spec: str) -> str:
-        formatted_group = self.copy()
+        # the separator is the only thing that can change, so there's no need to copy the group
+        separator = self.separator
         
         split_spec, rest = parse_format_spec_part(format_spec)
-        if split_spec[0] and isinstance(split_spec[0], str):
-            formatted_group.separator = split_spec[0]
-            split_spec, rest = parse_format_spec_part(format_spec)
+        part = split_spec[0]
+        if part and isinstance(part, str):
+            separator = part
+        elif isinstance(part, tuple) and part[0] in ['sep', 'separator']:
+            separator = part[1]
         else:
             rest = format_spec
-        
-        for part in split_spec:
-            if isinstance(part, tuple):
-                if part[0] in ['sep', 'separator']:
-                    formatted_group.separator = part[1]
-                    split_spec, rest = parse_format_spec_part(format_spec)
 
-        new_group = Group(separator = formatted_group.separator)
-        for item in formatted_group:
+        new_group = Group(separator = separator)
+        for item in self:
             if isinstance(item, (list, tuple, set)):
-                item = Group(item, separator = formatted_group.separator)
+                item = Group(item, separator = separator)
             
             new_group.append(md_format(f'{{item:{rest}}}', item = item))
             
@@ -1,4 +1,4 @@
-from .base import BaseNode, BaseBlockNode
+from .base import BaseNode, BaseBlockNode, HTMLSink, Sink, render
 from .group import Group
 from .text import Text
 
@@ -15,10 +15,9 @@ class Heading(BaseBlockNode):
     @property
     def level(self) -> int:
         try:
-            self.level = self._level
-        except:
+            return self._level
+        except AttributeError:
             return 1
-        return self._level
     
     @level.setter
     def level(self, level: int):
@@ -27,7 +26,17 @@ class Heading(BaseBlockNode):
         self._level = max(1, min(self._level, 6))
     
     def write(self) -> str:
-        return f"{'#' * self.level} {str(self.content)}"
+        return render(self._write_to)
+    
+    def _write_to(self, sink: Sink):
+        sink.write(f"{'#' * self.level} ")
+        sink.write_node(self.content)
+    
+    def _write_html(self, sink: HTMLSink):
+        tag = f'h{self.level}'
+        sink.open_tag(tag)
+        sink.write_node(self.content)
+        sink.close_tag(tag)
     
     def __repr__(self) -> str:
         return repr(self.write())
@@ -1,5 +1,8 @@
-from .base import BaseBlockNode
+from .base import BaseBlockNode, HTMLSink
 
 class HorizontalRule(BaseBlockNode):
     def write(self) -> str:
         return '---'
+    
+    def _write_html(self, sink: HTMLSink):
+        sink.write('<hr>')
@@ -1,5 +1,17 @@
+from .base import HTMLSink
 from .link import Link
+from ..urls import normalize_url
 
 class Image(Link):
     def write(self) -> str:
         return f"!{super().write()}"
+    
+    def _write_html(self, sink: HTMLSink):
+        if self.label and not self.link:
+            sink.write_text('!')
+            sink.write_node(self.label)
+            return
+        
+        link = normalize_url(self.link) if self.normalize else str(self.link)
+        
+        sink.open_tag('img', {'alt': str(self.label), 'src': link, 'title': self.title})
@@ -1,7 +1,11 @@
+from .base import HTMLSink, Sink
 from .group import Group
 
 class Lines(Group):
     block = True
     
-    def write(self) -> str:
-        return '\n'.join([str(x) for x in self])
+    def _write_to(self, sink: Sink):
+        self._write_parts(sink, '\n')
+    
+    def _write_html(self, sink: HTMLSink):
+        self._write_html_blocks(sink, '\n')
@@ -1,10 +1,9 @@
-from copy import deepcopy
-
-from furl import furl
+from copy import copy
 
 from ..md_format import parse_format_spec, md_format
+from ..urls import normalize_url
 from ..utils import escape
-from .base import BaseNode
+from .base import BaseNode, HTMLSink
 from .group import Group
 
 
@@ -12,10 +11,15 @@ class Link(BaseNode):
     label: str | BaseNode
     link: str
     title: str
+    normalize: bool = True
+    """Normalize the url with furl when writing. Set `Link.normalize = False` to turn it off everywhere."""
     
-    def __init__(self, label: str | BaseNode, link: str = None, title: str = '') -> None:
+    def __init__(self, label: str | BaseNode, link: str = None, title: str = '', normalize: bool | None = None) -> None:
         super().__init__()
         
+        if normalize != None:
+            self.normalize = normalize
+        
         if not link:
             self.link = label
             self.label = ''
@@ -26,7 +30,7 @@ class Link(BaseNode):
         self.title = title
     
     def write(self) -> str:
-        link = str(furl(self.link))
+        link = normalize_url(self.link) if self.normalize else str(self.link)
         
         if self.label and not self.link:
             return str(self.label)
@@ -37,6 +41,17 @@ class Link(BaseNode):
         else:
             return f"<{link}>"
 
+    def _write_html(self, sink: HTMLSink):
+        if self.label and not self.link:
+            sink.write_node(self.label)
+            return
+        
+        link = normalize_url(self.link) if self.normalize else str(self.link)
+        
+        sink.open_tag('a', {'href': link, 'title': self.title})
+        sink.write_node(self.label if self.label else self.link)
+        sink.close_tag('a')
+    
     def __repr__(self) -> str:
         return repr(self.write())
     
@@ -46,13 +61,13 @@ class Link(BaseNode):
         elif isinstance(value, BaseNode):
             return Group([self, value])
         
-        return Link(self.label + value, self.link)
+        return Link(self.label + value, self.link, normalize = self.__dict__.get('normalize'))
     
     def __format__(self, format_spec: str) -> str:
         try:
             return super().__format__(format_spec)
         except:
-            new_link = deepcopy(self)
+            new_link = copy(self)
             split_spec = parse_format_spec(format_spec)
             for part in split_spec:
                 format_dict = {
@@ -1,8 +1,11 @@
 from typing import Iterable, overload
 
-from .base import BaseNode
+from .base import BaseNode, HTMLSink, Sink
 from .lines import Lines
-from ..utils import indent
+
+
+def indent_line(line: str, amount: int = 4, char: str = " ") -> str:
+    return (char * amount) + line
 
 
 class List(Lines):
@@ -20,22 +23,52 @@ class List(Lines):
         self.ordered = bool(ordered)
         self.start = 1
     
-    def write(self) -> str:
-        lines = []
-        
+    def _write_to(self, sink: Sink):
         index = int(self.start)
         marker = self.marker
         
-        for line in self:
+        for line_index, line in enumerate(self):
+            if line_index:
+                sink.write('\n')
+            
             if isinstance(line, BaseNode) and line.block:
-                lines.append(indent(str(line)))
+                with sink.prefix(indent_line):
+                    sink.write_node(line)
             else:
                 if self.ordered:
                     marker = f'{index}.'
                     index += 1
                 
-                lines.append(f"{marker} {str(line)}")
+                sink.write(f"{marker} ")
+                sink.write_node(line)
+    
+    def _write_html(self, sink: HTMLSink):
+        tag = 'ol' if self.ordered else 'ul'
+        start = int(self.start)
+        
+        sink.open_tag(tag, {'start': start} if self.ordered and start != 1 else None)
+        sink.write('\n')
+        
+        # block nodes are indented under the item before them
+        in_item = False
+        for line in self:
+            if isinstance(line, BaseNode) and line.block:
+                if not in_item:
+                    sink.write('<li>')
+                    in_item = True
+                sink.write('\n')
+                sink.write_node(line)
+                sink.write('\n')
+                continue
+            
+            if in_item:
+                sink.write('</li>\n')
+            sink.write('<li>')
+            sink.write_node(line)
+            in_item = True
         
-        return '\n'.join(lines)
+        if in_item:
+            sink.write('</li>\n')
+        sink.close_tag(tag)
 
 
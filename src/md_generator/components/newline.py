@@ -1,5 +1,8 @@
-from .base import BaseNode
+from .base import BaseNode, HTMLSink
 
 class NewLine(BaseNode):
     def write(self) -> str:
         return "<br>"
+    
+    def _write_html(self, sink: HTMLSink):
+        sink.write('<br>')
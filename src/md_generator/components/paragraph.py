@@ -1,4 +1,8 @@
+from .base import HTMLSink
 from .group import Group
 
 class Paragraph(Group):
     block = True
+    
+    def _write_html(self, sink: HTMLSink):
+        self._write_html_blocks(sink, self.separator)
@@ -1,22 +1,91 @@
 import csv
+import html
 import io
 import os
-from typing import IO, Any, Iterable, Literal, Optional, Callable
+from typing import IO, Any, Iterable, Iterator, Literal, Optional, Callable
 from itertools import zip_longest
 import itertools
 import operator
-from copy import deepcopy
-import re
+from copy import copy
+from datetime import datetime, timezone
+import math
 
-from ..utils import escape, strbool
-from .base import BaseBlockNode
+from ..filters import compile_predicate
+from ..utils import compile_escape, display_width, escape_and_measure, strbool
+from .base import BaseBlockNode, BaseNode, HTMLSink, Sink
 from .enums import ALIGNMENT, ALIGNMENT_SHORT
 from .. import csv_tools
 
 
-from ..md_format import parse_format_spec, md_format
+from ..md_format import parse_format_spec, RowFormatter
+
+def _number_key(cell: Any):
+    # numbers first, then everything else (and nan, which can't be ordered) as text
+    try:
+        number = float(cell)
+    except (TypeError, ValueError):
+        return (1, 0.0, str(cell))
+    
+    if math.isnan(number):
+        return (1, 0.0, str(cell))
+    return (0, number, '')
+
+def _date_key(cell: Any):
+    # dates first, then everything else as text. Dates without a time zone
+    # count as utc, so they can be compared with dates that have one.
+    try:
+        date = datetime.fromisoformat(str(cell))
+    except ValueError:
+        return (1, datetime.min, str(cell))
+    
+    if date.tzinfo != None:
+        date = date.astimezone(timezone.utc).replace(tzinfo = None)
+    return (0, date, '')
+
+SORT_TYPES: dict[str, Callable[[Any], Any]] = {
+    'str': str,
+    'num': _number_key,
+    'number': _number_key,
+    'date': _date_key,
+}
+
+class _Layout():
+    # Escaped cells and running column widths of an incremental table, so
+    # appending a row only has to escape and measure that row. `lines` holds
+    # the rendered rows, and is cleared when a column gets wider.
+    def __init__(self, header: list[tuple[str, int]]) -> None:
+        self.header = header
+        self.widths = [width for _, width in header]
+        self.cells: list[list[tuple[str, int]]] = []
+        self.lines: list[str] | None = []
+    
+    def add(self, cells: list[tuple[str, int]]) -> bool:
+        self.cells.append(cells)
+        
+        grew = False
+        widths = self.widths
+        for index, (_, width) in enumerate(cells):
+            if width > widths[index]:
+                widths[index] = width
+                grew = True
+        
+        if grew:
+            self.lines = None
+        return grew
 
 class Table(BaseBlockNode):
+    padded: bool = True
+    """Pad cells to the width of their column. Without padding, the table is
+    rendered in one pass, without measuring any cells."""
+    IA_TABLE_CLASS = 'table table-bordered table-striped table-hover'
+    IA_TABLE_STYLE = 'margin-bottom: 0; word-break: auto-phrase;'
+    IA_CELL_STYLE = 'word-break: auto-phrase;'
+    
+    incremental: bool = False
+    """Keep the escaped cells, column widths and rendered rows between writes,
+    so `append_row()` and `extend()` only have to render the new rows. Rows
+    are only re-padded (not re-escaped) when a column gets wider."""
+    
     def __init__(
         self,
         header: Iterable,
@@ -25,73 +94,255 @@ class Table(BaseBlockNode):
     ) -> None:
         super().__init__()
         
+        self.__layout: _Layout | None = None
+        
         if rows == None:
             if isinstance(header[0], (list, tuple, set)):
                 rows = header[1::]
                 header = header[0]
         
+        self.__header: list[Any] = []
+        self.__rows: list[list[Any]] = []
+        self.__alignment: list[str] = []
+        self.__display_header_names: list[str] = []
+        self.__source: Iterable[Iterable] | None = None
+        self.__source_width = 0
+        self.__pipeline: list[Callable[[Iterable[list[Any]]], Iterable[list[Any]]]] = []
+        
         self.header = header
         self.display_header = None
         self.rows = rows
         self.alignment = alignment
     
+    # Rows, alignment and the display header are normalized to the width of
+    # the header when they're set (or when the header changes), so the
+    # getters can just return the stored lists.
+    
     @property
     def header(self) -> list[Any]:
         return self.__header
     @header.setter
     def header(self, value: Iterable[Any]):
+        old_length = len(self.__header)
+        
         if value == None:
             self.__header = []
         else:
             self.__header = list(value)
+        
+        if len(self.__header) != old_length:
+            header_length = len(self.__header)
+            self.__rows = [row if len(row) == header_length else self._normalize_row(row) for row in self.__rows]
+            self.alignment = self.__alignment
+        
+        self.display_header = self.__display_header_names
     
     @property
-    def display_header(self):
-        header = []
-        for cell in zip_longest(self.__display_header[0:len(self.header)], self.header):
-            header.append(cell[0] if cell[0] else cell[1])
-        self.__display_header = header
-        return header
+    def display_header(self) -> list[Any]:
+        return self.__display_header
     
     @display_header.setter
     def display_header(self, header: list[str]):
         if header == None:
-            self.__display_header = []
+            self.__display_header_names = []
         else:
-            self.__display_header = list(header)
+            self.__display_header_names = list(header)
+        
+        self.__display_header = [
+            cell[0] if cell[0] else cell[1]
+            for cell in zip_longest(self.__display_header_names[0:len(self.header)], self.header)
+        ]
     
     @property
     def rows(self) -> list[list[Any]]:
-        rows: list[list[Any]] = []
-        
-        header_length = len(self.header)
-        
-        for row in self.__rows:
-            row = list(row)
-            
-            if len(row) > header_length:
-                row = row[0:header_length]
-            elif len(row) < header_length:
-                for i in range(header_length - len(row)):
-                    row.append('')
-            
-            rows.append(row)
-        
-        self.__rows = rows
+        """Rows of the table.
+        
+        This is the stored list, not a copy. Don't change it or its rows in
+        place: add rows with `append_row()` or `extend()`, or set `rows` to a
+        new list. Rows appended to it directly are padded or cut to the width
+        of the header before the table is used, but the render cache isn't
+        cleared.
+        """
+        if self.lazy:
+            # something needs all the rows, so load them
+            self.rows = self._iter_source()
         return self.__rows
     @rows.setter
     def rows(self, value):
         if value == None:
             value = []
-        self.__rows: list[list[Any]] = [list(x) for x in value]
+        self.__source = None
+        self.__pipeline = []
+        self.__rows = [self._normalize_row(row) for row in value]
+    
+    def view(self) -> "Table":
+        """Get a table that shares the rows with this table.
+        
+        Sorting, filtering, ordering, aligning and transforming the view
+        doesn't change this table, and doesn't copy the cells. Sorting and
+        filtering only rearrange references to the same rows, and stages that
+        change cells make new rows. Changing a row in place changes it in both
+        tables.
+
+        Returns:
+            Table: view
+        """
+        table = copy(self)
+        table.__header = list(self.__header)
+        table.__display_header_names = list(self.__display_header_names)
+        table.__display_header = list(self.__display_header)
+        table.__alignment = list(self.__alignment)
+        table.__rows = list(self.__rows)
+        table.__pipeline = list(self.__pipeline)
+        table.__layout = None
+        return table
+    
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith('_'):
+            # the layout is kept even when the render isn't cached
+            self.__layout = None
+    
+    def invalidate(self):
+        self.__layout = None
+        super().invalidate()
+    
+    def _children(self):
+        yield from super()._children()
+        for row in self.__rows:
+            for cell in row:
+                if isinstance(cell, BaseNode):
+                    yield cell
+    
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_Table__layout'] = None
+        return state
+    
+    def append_row(self, row: Iterable[Any]):
+        """Add a row to the end of the table.
+        
+        With `incremental` on, only the new row gets escaped and measured.
+
+        Args:
+            row (Iterable[Any]): row
+        """
+        self.extend([row])
+    
+    def extend(self, rows: Iterable[Iterable[Any]]):
+        """Add rows to the end of the table.
+        
+        With `incremental` on, only the new rows get escaped and measured.
+
+        Args:
+            rows (Iterable[Iterable[Any]]): rows
+        """
+        layout = self.__layout
+        table_rows = self.rows
+        start = len(table_rows)
+        
+        table_rows.extend(map(self._normalize_row, rows))
+        
+        new_rows = table_rows[start:]
+        
+        # clear the render cache, and the cache of every node this is in, but
+        # keep the layout
+        super().invalidate()
+        self.__layout = layout
+        
+        if layout != None:
+            self._add_to_layout(layout, new_rows)
+    
+    def _add_to_layout(self, layout: _Layout, rows: Iterable[list[Any]]):
+        escape_cell = self._escape_cell
+        alignment = self.alignment
+        
+        for row in rows:
+            cells = [escape_cell(cell) for cell in row]
+            if not layout.add(cells) and layout.lines != None:
+                layout.lines.append(self._render_cells(cells, layout.widths, alignment))
+    
+    def _get_layout(self) -> _Layout:
+        if self.__layout == None:
+            layout = _Layout([self._escape_header_cell(cell) for cell in self.display_header])
+            # the widths aren't known yet, so render the rows afterwards
+            layout.lines = None
+            self._add_to_layout(layout, self._checked_rows())
+            self.__layout = layout
+        
+        layout = self.__layout
+        if layout.lines == None:
+            # a column got wider, so re-pad every row from the escaped cells
+            alignment = self.alignment
+            layout.lines = [self._render_cells(cells, layout.widths, alignment) for cells in layout.cells]
+        
+        return layout
+    
+    def _checked_rows(self) -> list[list[Any]]:
+        # rows appended to `self.rows` directly skip the setter
+        rows = self.rows
+        header_length = len(self.header)
+        
+        if rows and set(map(len, rows)) != {header_length}:
+            rows[:] = [row if len(row) == header_length else self._normalize_row(row) for row in rows]
+        
+        return rows
+    
+    def _render_cells(self, cells: list[tuple[str, int]], widths: list[int], alignment: list[str]) -> str:
+        return self._join_row(self._create_row([cell for cell, _ in cells], widths, alignment, cell_widths = [width for _, width in cells]))
+    
+    @property
+    def lazy(self) -> bool:
+        """Whether the rows are read from the source while rendering, instead of being stored."""
+        return self.__source != None
+    
+    def _iter_source(self) -> Iterator[list[Any]]:
+        # the stages expect rows with the width of the header the source was
+        # read with, so normalize the raw rows to that first
+        width = self.__source_width
+        rows = itertools.islice(iter(self.__source), 1, None)
+        rows = (row if len(row) == width else self._normalize_row(row, width) for row in rows)
+        
+        for stage in self.__pipeline:
+            rows = stage(rows)
+        
+        return iter(rows)
+    
+    def _apply(self, stage: Callable[[Iterable[list[Any]]], Iterable[list[Any]]]):
+        # Lazy tables run the stage while rendering, other tables run it now.
+        # Stages must yield lists with the width of the header at the time
+        # the stage was added.
+        if self.lazy:
+            self.__pipeline.append(stage)
+        else:
+            self.__rows = list(stage(self._checked_rows()))
+        
+        self.invalidate()
+    
+    def _normalize_row(self, row: Iterable[Any], header_length: int | None = None) -> list[Any]:
+        row = list(row)
+        if header_length == None:
+            header_length = len(self.header)
+        
+        if len(row) > header_length:
+            del row[header_length:]
+        elif len(row) < header_length:
+            row.extend([''] * (header_length - len(row)))
+        
+        return row
     
     @property
     def alignment(self) -> list[Literal[ALIGNMENT.LEFT, ALIGNMENT.CENTER, ALIGNMENT.RIGHT]]:
+        return self.__alignment
+    
+    @alignment.setter
+    def alignment(self, value):
         header_length = len(self.header)
-        alignment: list[Literal[ALIGNMENT.LEFT, ALIGNMENT.CENTER, ALIGNMENT.RIGHT]] = self.__alignment
 
-        if not isinstance(alignment, (list, tuple)):
-            alignment = [alignment]
+        if isinstance(value, (list, tuple)):
+            alignment = list(value)
+        else:
+            alignment = [value]
         
         if len(alignment) > header_length:
             alignment = alignment[0:header_length]
@@ -100,8 +351,7 @@ class Table(BaseBlockNode):
             if len(alignment) > 0:
                 base_alignment = alignment[-1]
             
-            for i in range(header_length - len(alignment)):
-                alignment.append(base_alignment)
+            alignment.extend([base_alignment] * (header_length - len(alignment)))
         
         for column in range(len(alignment)):
             alignment[column] = str(alignment[column]).lower()
@@ -115,103 +365,164 @@ class Table(BaseBlockNode):
             
             if alignment[column] not in ALIGNMENT:
                 alignment[column] = ALIGNMENT.LEFT
-            
         
-        self.alignment = alignment
-        return alignment
-    
-    @alignment.setter
-    def alignment(self, value):
-        self.__alignment = value
+        self.__alignment = alignment
     
     def as_dict(self):
-        return [{self.header[index]: cell for index, cell in enumerate(row)} for row in self.rows]
+        return [{self.header[index]: cell for index, cell in enumerate(row)} for row in self._checked_rows()]
         
-    def sort(self, keys: list[str | tuple[str, bool]]):
+    def sort(self, keys: list[str | tuple[str, bool] | tuple[str, bool, str | Callable[[Any], Any]]]):
+        """Sort the rows.
+        
+        Later keys take priority, the same as sorting by each key in turn.
+        The rows are sorted in one stable pass.
+
+        Args:
+            keys (list[str | tuple[str, bool] | tuple[str, bool, str | Callable[[Any], Any]]]): Keys to sort by. Each key can be a column name, or a tuple of (column, reverse, type). The type can be 'str', 'num' or 'date' (see `SORT_TYPES`), or a function that converts the cell into a sort key.
+        """
         key_items = []
         
         for value in keys:
             key = value
             reverse = False
+            key_type = None
             if isinstance(value, (list, tuple)):
                 key = value[0]
                 if len(value) > 1:
                     reverse = value[1]
+                if len(value) > 2:
+                    key_type = value[2]
 
             if not key in self.header:
                 raise KeyError(f'key "{key}" is not in header')
             
-            key_items.append((self.header.index(key), reverse))
+            if isinstance(key_type, str):
+                if key_type.lower() not in SORT_TYPES:
+                    raise ValueError(f'unknown sort type "{key_type}"')
+                key_type = SORT_TYPES[key_type.lower()]
+            
+            key_items.append((self.header.index(key), bool(reverse), key_type))
+        
+        # later keys take priority
+        key_items.reverse()
         
-        for sort_value in key_items:
-            self.rows.sort(key = operator.itemgetter(sort_value[0]), reverse = sort_value[1])
+        def sort_rows(rows: Iterable[list[Any]]):
+            rows = list(rows)
+            if not key_items:
+                return rows
+            
+            columns = []
+            for index, reverse, key_type in key_items:
+                column = [row[index] for row in rows]
+                if key_type != None:
+                    column = list(map(key_type, column))
+                columns.append(column)
+            
+            directions = {reverse for _, reverse, _ in key_items}
+            reverse = False
+            
+            if len(directions) == 1:
+                reverse = directions.pop()
+            else:
+                # Mixed directions can't use reverse, so replace the reversed
+                # columns with their negated rank.
+                for column_index, (_, column_reverse, _) in enumerate(key_items):
+                    if column_reverse:
+                        ranks = {value: rank for rank, value in enumerate(sorted(set(columns[column_index])))}
+                        columns[column_index] = [-ranks[value] for value in columns[column_index]]
+            
+            if len(columns) == 1:
+                sort_keys = columns[0]
+            else:
+                sort_keys = list(zip(*columns))
+            
+            order = sorted(range(len(rows)), key = sort_keys.__getitem__, reverse = reverse)
+            return [rows[index] for index in order]
+        
+        self._apply(sort_rows)
     
-    def filter(self, keys: dict[str, str | re.Pattern]):
+    def filter(self, keys: dict[str, Any] | Iterable[tuple[str, Any]]):
+        """Only keep rows that match all the rules.
+        
+        Rules can be strings like `value`, `!value`, `~regex`, `>=10` or
+        `(a,b,c)`, compiled regexes, sets of values, numbers, or functions.
+        See `filters.compile_predicate()`. In a format spec, rules are
+        written `filter=column=>=10`. Quote rules that have `:` or `,` in
+        them, like `filter=column="~a,b"`.
+
+        Args:
+            keys (dict[str, Any] | Iterable[tuple[str, Any]]): Rules for each column. Use a list of (column, rule) pairs to have more than one rule for a column.
+        """
+        if isinstance(keys, dict):
+            keys = keys.items()
+        
         rules = []
         
-        for key, item in keys.items():
+        for key, item in keys:
             if not key in self.header:
                 raise KeyError(f'key "{key}" is not in header')
             
-            rules.append((self.header.index(key), item))
-        
-        def keep(row: list[str]):
-            for index, pattern in rules:
-                if not isinstance(pattern, re.Pattern):
-                    pattern = re.compile(pattern)
-                    
-                if not pattern.match(row[index]):
-                    return False
-                elif row[index] != pattern.pattern:
-                    return False
+            rules.append((self.header.index(key), compile_predicate(item)))
+        
+        def filter_rows(rows: Iterable[list[Any]]):
+            if isinstance(rows, list):
+                # check one column at a time, only on the rows that are left
+                for index, predicate in rules:
+                    rows = list(itertools.compress(rows, map(predicate, map(operator.itemgetter(index), rows))))
+                return rows
             
-            return True
+            return (row for row in rows if all(predicate(row[index]) for index, predicate in rules))
         
         if len(rules):
-            self.rows = filter(lambda row: keep(row), self.rows)
+            self._apply(filter_rows)
     
     def set_header_order(self, new_header: list[str] | dict[str, str]):
         if isinstance(new_header, (list, tuple)):
             new_header = {cell: cell for cell in new_header}
 
-        new_rows = [[row[self.header.index(name)] if name in self.header else '' for name in new_header] for row in self.rows]
+        indexes = [self.header.index(name) if name in self.header else None for name in new_header]
         
-        self.header = new_header.items()
+        self._apply(lambda rows: ([row[index] if index != None else '' for index in indexes] for row in rows))
+        self.header = new_header.keys()
         self.display_header = new_header.values()
-        self.rows = new_rows
     
     def transform(self, row_transformations: dict[str, str]):
         if not isinstance(row_transformations, dict):
             raise TypeError('row_transformations must be dict')
         
-        rows_dict = self.as_dict()
-        rows = []
-        
-        for row_dict in rows_dict:
-            row = []
-            for key, new in row_transformations.items():
-                if key not in row_dict:
-                    continue
-                row_dict[key] = md_format(new, **row_dict)
-            
-            for key in self.header:
-                row.append(row_dict.get(key, ''))
-            
-            rows.append(row)
+        formatter = RowFormatter(self.header, row_transformations)
         
-        self.rows = rows
+        if formatter.templates:
+            self._apply(formatter.format_rows)
     
-    def _create_row(self, row: list, lengths: list[int], alignment: list[Literal[ALIGNMENT.LEFT, ALIGNMENT.CENTER, ALIGNMENT.RIGHT]], pad_char: str = " "):
-        padding_directions = {
-            ALIGNMENT.LEFT: '<',
-            ALIGNMENT.CENTER: '^',
-            ALIGNMENT.RIGHT: '>',
-        }
-        
+    def _create_row(
+        self,
+        row: list,
+        lengths: list[int],
+        alignment: list[Literal[ALIGNMENT.LEFT, ALIGNMENT.CENTER, ALIGNMENT.RIGHT]],
+        pad_char: str = " ",
+        cell_widths: list[int] | None = None,
+    ):
         result = []
         
         for row_index in range(len(row)):
-            result.append(f"{pad_char}{str(row[row_index]):{pad_char}{padding_directions.get(alignment[row_index], '<')}{lengths[row_index]}}{pad_char}")
+            cell = str(row[row_index])
+            if cell_widths == None:
+                width = display_width(cell)
+            else:
+                width = cell_widths[row_index]
+            
+            # padded by hand, since format() pads by length, not display width
+            padding = max(lengths[row_index] - width, 0)
+            side = alignment[row_index]
+            if side == ALIGNMENT.RIGHT:
+                left = padding
+            elif side == ALIGNMENT.CENTER:
+                left = padding // 2
+            else:
+                left = 0
+            
+            result.append(f"{pad_char}{pad_char * left}{cell}{pad_char * (padding - left)}{pad_char}")
         
         return result
     
@@ -236,30 +547,204 @@ class Table(BaseBlockNode):
         
         return result
     
-    def write(self) -> str:
-        table = []
-        
-        text = ""
+    def _escape_cell(self, cell: Any) -> tuple[str, int]:
+        # returns the escaped cell and its display width
+        return escape_and_measure(str(cell).replace('\n', '<br>'), '|')
+    
+    def _escape_header_cell(self, cell: Any) -> tuple[str, int]:
+        return escape_and_measure(str(cell).replace('\n', '<br>'))
+    
+    def _iter_compact_lines(self, rows: Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None = None) -> Iterator[str]:
+        escape_cell = compile_escape('|')
+        escape_header_cell = compile_escape()
+        
+        yield self._join_row([f" {escape_header_cell(str(cell).replace('\n', '<br>'))} " for cell in self.display_header])
+        yield self._join_row(self._create_under_header_row([1] * len(self.header), self.alignment))
+        for row in self._iter_rows(rows):
+            yield self._join_row([f" {escape_cell(str(cell).replace('\n', '<br>'))} " for cell in row])
+    
+    def _iter_rows(self, rows: Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None = None) -> Iterator[list[Any]]:
+        if rows == None:
+            if self.lazy:
+                return map(self._normalize_row, self._iter_source())
+            return iter(self._checked_rows())
         
-        header = [escape(str(cell).replace('\n', '<br>'), '|') for cell in self.header]
-        display_header = [escape(cell).replace('\n', '<br>') for cell in self.display_header]
-        rows = [[escape(str(cell).replace('\n', '<br>'), '|') for cell in row] for row in self.rows]
-        column_lengths = [max([len(escape(cell, '|')) for cell in column]) for column in zip(display_header, *rows)]
+        if callable(rows):
+            rows = rows()
         
-        table.append(self._create_row(display_header, column_lengths, self.alignment))
-        table.append(self._create_under_header_row(column_lengths, self.alignment))
-        for row in rows:
-            table.append(self._create_row(row, column_lengths, self.alignment))
-        
-        text = '\n'.join([f"|{'|'.join(r)}|" for r in table])
+        return map(self._normalize_row, rows)
+    
+    def column_widths(self, rows: Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None = None) -> list[int]:
+        """Get the width of each column when rendered.
+
+        Args:
+            rows (Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None, optional): Rows to measure instead of `self.rows`. Can be a function that returns a new iterable of rows. Defaults to None.
+
+        Returns:
+            list[int]: column widths
+        """
+        if rows == None and self.incremental and not self.lazy:
+            return list(self._get_layout().widths)
+        
+        widths = [self._escape_header_cell(cell)[1] for cell in self.display_header]
+        escape_cell = self._escape_cell
+        
+        for row in self._iter_rows(rows):
+            for index, cell in enumerate(row):
+                length = escape_cell(cell)[1]
+                if length > widths[index]:
+                    widths[index] = length
+        
+        return widths
+    
+    def iter_lines(
+        self,
+        rows: Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None = None,
+        widths: list[int] | None = None,
+        padded: bool | None = None,
+    ) -> Iterator[str]:
+        """Render the table one line at a time.
+        
+        If `widths` is not given, the rows are read twice, once to get the
+        column widths, and once to render them, so only one row is in memory
+        at a time. Unpadded tables are always rendered in one pass.
+
+        Args:
+            rows (Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None, optional): Rows to render instead of `self.rows`. If it can only be iterated once, pass a function that re-opens it, or pass `widths`. Defaults to None.
+            widths (list[int] | None, optional): Column widths, from `column_widths()`. Defaults to None.
+            padded (bool | None, optional): Pad cells to the width of their column. Defaults to `self.padded`.
+
+        Yields:
+            str: table line, without the trailing newline
+        """
+        if padded == None:
+            padded = self.padded
+        if not padded:
+            yield from self._iter_compact_lines(rows)
+            return
+        
+        if rows == None and widths == None and self.incremental and not self.lazy:
+            layout = self._get_layout()
+            alignment = self.alignment
+            yield self._render_cells(layout.header, layout.widths, alignment)
+            yield self._join_row(self._create_under_header_row(layout.widths, alignment))
+            yield from layout.lines
+            return
+        
+        if widths == None:
+            if rows != None and not callable(rows) and iter(rows) is rows:
+                raise TypeError('rows can only be read once, pass a function that returns the rows, or the column widths')
+            widths = self.column_widths(rows)
+        
+        alignment = self.alignment
+        
+        escape_cell = self._escape_cell
+        
+        yield self._render_cells([self._escape_header_cell(cell) for cell in self.display_header], widths, alignment)
+        yield self._join_row(self._create_under_header_row(widths, alignment))
+        for row in self._iter_rows(rows):
+            yield self._render_cells([escape_cell(cell) for cell in row], widths, alignment)
+    
+    def write_to(
+        self,
+        file: IO[str],
+        rows: Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None = None,
+        widths: list[int] | None = None,
+        padded: bool | None = None,
+    ):
+        """Write the table to a file without rendering the whole table in memory.
+        
+        To write to a socket, use `socket.makefile('w')`.
+
+        Args:
+            file (IO[str]): File to write to.
+            rows (Iterable[Iterable] | Callable[[], Iterable[Iterable]] | None, optional): See `iter_lines()`. Defaults to None.
+            widths (list[int] | None, optional): See `iter_lines()`. Defaults to None.
+            padded (bool | None, optional): See `iter_lines()`. Defaults to None.
+        """
+        separator = ''
+        for line in self.iter_lines(rows, widths, padded):
+            file.write(separator)
+            file.write(line)
+            separator = '\n'
+    
+    def _write_to(self, sink: Sink):
+        self.write_to(sink)
+    
+    def _write_html(self, sink: HTMLSink):
+        use_ia = sink.use_ia
+        alignment = self.alignment
         
-        return text
+        # the same styles the markdown tables extension adds
+        if all(side == ALIGNMENT.LEFT for side in alignment):
+            styles = [''] * len(alignment)
+        else:
+            styles = [f'text-align: {side};' for side in alignment]
+        if use_ia:
+            styles = [style + self.IA_CELL_STYLE for style in styles]
+        
+        if use_ia:
+            sink.write('<div class="ui-accordion" style="margin-bottom: 20px;">')
+            sink.write('<div class="ui-accordion-content table-responsive" style="padding: 0; border-top: 0;">')
+            sink.open_tag('table', {'class': self.IA_TABLE_CLASS, 'style': self.IA_TABLE_STYLE})
+        else:
+            sink.open_tag('table')
+        
+        sink.write('\n<thead>\n<tr>\n')
+        for cell, style in zip(self.display_header, styles):
+            self._write_html_cell(sink, 'th', cell, style)
+        sink.write('</tr>\n</thead>\n<tbody>\n')
+        
+        for row in self._iter_rows():
+            sink.write('<tr>\n')
+            for cell, style in zip(row, styles):
+                self._write_html_cell(sink, 'td', cell, style)
+            sink.write('</tr>\n')
+        
+        sink.write('</tbody>\n</table>')
+        if use_ia:
+            sink.write('</div></div>')
+    
+    def _write_html_cell(self, sink: HTMLSink, tag: str, cell: Any, style: str):
+        sink.open_tag(tag, {'style': style})
+        if isinstance(cell, BaseNode):
+            sink.write_node(cell)
+        else:
+            sink.write(html.escape(str(cell), quote = False).replace('\n', '<br>'))
+        sink.close_tag(tag)
+        sink.write('\n')
+    
+    def _join_row(self, row: list[str]) -> str:
+        return f"|{'|'.join(row)}|"
+    
+    def write(self, padded: bool | None = None) -> str:
+        return '\n'.join(self.iter_lines(padded = padded))
     
     @classmethod
-    def from_csv(cls, csv_file: str | IO) -> "Table":
-        table = csv_tools.load_csv(csv_file)
+    def from_csv(cls, csv_file: str | IO, lazy: bool = False, encoding: str | None = None, workers: int | None = None) -> "Table":
+        """Create a table from a csv file.
+
+        Args:
+            csv_file (str | IO): Path to a csv file, csv text, or file object.
+            lazy (bool, optional): Read the rows from the file while rendering instead of loading them. Sorting, filtering, ordering and transforming get applied while the rows are read. Only the header is read up front. Defaults to False.
+            encoding (str | None, optional): Encoding of the csv file. Detected if not given. Defaults to None.
+            workers (int | None, optional): Number of processes to parse a csv file in. See `csv_tools.read_csv_parallel()`. Defaults to None.
 
-        return Table(table[0], table[1::])
+        Returns:
+            Table: table
+        """
+        source = csv_tools.CSVSource(csv_file, encoding, workers)
+        rows = iter(source)
+        header = next(rows, [])
+
+        if lazy and source.reopenable:
+            rows.close()
+            table = Table(header, [])
+            table.__source = source
+            table.__source_width = len(header)
+            return table
+
+        return Table(header, rows)
     
     @classmethod
     def table_from_dict(cls, table: list[dict]):
@@ -279,44 +764,60 @@ class Table(BaseBlockNode):
         return Table(header, rows)
 
     def __format__(self, format_spec: str) -> str:
-        formatted_table = deepcopy(self)
+        formatted_table = self.view()
         
         split_spec = parse_format_spec(format_spec)
-
-        print('spec', format_spec)
         
         for part in split_spec:
-            if isinstance(part, tuple):
-                if part[0] == 'sort':
+            if isinstance(part, str):
+                if part.lower() == 'compact':
+                    formatted_table.padded = False
+            elif isinstance(part, tuple):
+                if part[0] == 'compact':
+                    formatted_table.padded = not strbool(part[1]) if isinstance(part[1], str) else False
+                elif part[0] == 'sort':
                     sort_order = []
-                    if isinstance(part[1], str):
-                        sort_order.append((part[1], False))
-                    elif isinstance(part[1], list):
-                        for key in part[1]:
-                            reverse = False
-                            if isinstance(key, str):
-                                if key[-1] in ['<', '>', '=']:
-                                    reverse = key[-1] == '>'
-                                    key = key[:-1]
-                            elif isinstance(key, list):
-                                if len(key) > 1:
-                                    if key[1] == '>':
-                                        reverse = True
-                                    else:
-                                        reverse = strbool(key[1])
+                    keys = part[1]
+                    if isinstance(keys, str):
+                        keys = [keys]
+                    
+                    for key in keys:
+                        reverse = False
+                        key_type = None
+                        if isinstance(key, str):
+                            if key and key[-1] in ['<', '>', '=']:
+                                reverse = key[-1] == '>'
+                                key = key[:-1]
+                        elif isinstance(key, list):
+                            # key=num>, key=date, key=>, key=true
+                            option = key[1] if len(key) > 1 else ''
+                            key = key[0]
+                            
+                            if option and option[-1] in ['<', '>']:
+                                reverse = option[-1] == '>'
+                                option = option[:-1]
                             
-                            sort_order.append((key, reverse))
+                            if option.lower() in SORT_TYPES:
+                                key_type = option
+                            elif option:
+                                reverse = strbool(option)
+                        
+                        sort_order.append((key, reverse, key_type))
 
                     formatted_table.sort(sort_order)
                 
                 elif part[0] == 'filter':
-                    filter_rules = {}
+                    filter_rules = []
                     if isinstance(part[1], list):
                         for rule in part[1]:
                             if isinstance(rule[0], list):
+                                if rule[0][-1].lstrip('!') in ['<', '>']:
+                                    # the spec splits `a=>=9` at both `=`, so
+                                    # give the `>` back to the rule
+                                    rule[1] = f'{rule[0].pop()}={rule[1]}'
                                 rule[0] = '='.join(rule[0])
                             if isinstance(rule, list):
-                                filter_rules[rule[0]] = rule[1]
+                                filter_rules.append((rule[0], rule[1]))
                     
                     formatted_table.filter(filter_rules)
                 
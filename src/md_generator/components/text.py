@@ -1,7 +1,7 @@
 from copy import copy
 import re
 
-from .base import BaseNode
+from .base import BaseNode, HTMLSink
 from .group import Group
 from ..utils import escape, backtick_count
 
@@ -43,6 +43,15 @@ class Text(BaseNode):
         
         return text
     
+    def _write_html(self, sink: HTMLSink):
+        tags = [tag for tag, enabled in [('em', self.italic), ('strong', self.bold), ('code', self.code)] if enabled]
+        
+        for tag in tags:
+            sink.open_tag(tag)
+        sink.write_node(self.text)
+        for tag in reversed(tags):
+            sink.close_tag(tag)
+    
     def __repr__(self) -> str:
         return repr(self.write())
     
@@ -1,33 +1,254 @@
 import csv
 import io
 import os
+import re
 import sys
-from typing import IO
+from typing import IO, TYPE_CHECKING, Callable, Generator, Iterable, Iterator
 from itertools import zip_longest
 
-import charset_normalizer
+from .encoding import get_encoding
 
-def load_csv(csv_file: str | IO) -> list[list[str | None]]:
-    table = None
-    if hasattr(csv_file, 'read'):
-        table = list[csv.reader(file)]
-    else:
-        try:
-            csv_file = str(csv_file)
-            if os.path.isfile(csv_file):
-                encoding = charset_normalizer.from_path(csv_file).best().encoding
+if TYPE_CHECKING:
+    import mmap
 
-                with open(csv_file, 'r', newline = '', encoding = encoding) as file:
-                    table = list(csv.reader(file))
-            else:
-                table = list(csv.reader(io.StringIO(csv_file, newline = '')))
-    # else:
-        except:
-            e = TypeError('input is not a csv')
-            e.add_note(str(csv_file))
-            raise e
+CHUNK_SIZE = 16 * 1024 * 1024
+
+class CSVSource():
+    """Csv file that can be read row by row, more than once.
+    
+    Cells are stripped as they are read. Each iteration re-opens the file (or
+    seeks back to the start for file objects), so the whole table is never
+    loaded at once. With `workers`, files are read with
+    `read_csv_parallel()`.
+    """
+    def __init__(self, csv_file: str | IO, encoding: str | None = None, workers: int | None = None) -> None:
+        self.path = None
+        self.file = None
+        self.text = None
+        self.encoding = None
+        self.start = None
+        self.workers = workers
+        self._read = False
+        
+        if hasattr(csv_file, 'read'):
+            self.file = csv_file
+            if csv_file.seekable():
+                self.start = csv_file.tell()
+        else:
+            try:
+                csv_file = str(csv_file)
+                if os.path.isfile(csv_file):
+                    self.path = csv_file
+                    self.encoding = get_encoding(csv_file, encoding)
+                else:
+                    self.text = csv_file
+            except:
+                e = TypeError('input is not a csv')
+                e.add_note(str(csv_file))
+                raise e
+    
+    @property
+    def reopenable(self) -> bool:
+        return self.file == None or self.start != None
+    
+    def __iter__(self) -> Iterator[list[str | None]]:
+        if self.path != None:
+            if self.workers != None and self.workers > 1:
+                yield from read_csv_parallel(self.path, self.encoding, self.workers)
+                return
+            
+            with open(self.path, 'r', newline = '', encoding = self.encoding) as file:
+                yield from map(minify_row, csv.reader(file))
+        elif self.file != None:
+            if self.start != None:
+                self.file.seek(self.start)
+            elif self._read:
+                raise TypeError('csv file can only be read once')
+            self._read = True
+            
+            yield from map(minify_row, csv.reader(self.file))
+        else:
+            yield from map(minify_row, csv.reader(io.StringIO(self.text, newline = '')))
+    
+    def __deepcopy__(self, memo):
+        # the file is only read, so copies can share it
+        return self
+
+def split_csv(file: "mmap.mmap | bytes", chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[int, int]]:
+    """Split a csv file into chunks of rows.
+    
+    Chunks end at a newline with an even number of quotes before it, so
+    newlines in quoted cells don't split rows. A quote inside an unquoted
+    cell (like `5" screen`) throws the count off, so use `ends_row()` to
+    check each chunk. The file has to use `"` for quotes, and an encoding
+    where `"` and `\\n` are always those characters, like utf-8 or latin-1.
+
+    Args:
+        file (mmap.mmap | bytes): Contents of the file.
+        chunk_size (int, optional): Size to aim for in bytes. Chunks are bigger when rows are. Defaults to CHUNK_SIZE.
+
+    Yields:
+        tuple[int, int]: start and end of each chunk
+    """
+    size = len(file)
+    start = 0
+    
+    while start < size:
+        end = file.find(b'\n', min(start + chunk_size, size) - 1)
+        quotes = file[start:end + 1].count(b'"') if end >= 0 else 0
+        
+        while end >= 0 and quotes % 2:
+            # the newline is in a quoted cell, so move on to the next one
+            next_end = file.find(b'\n', end + 1)
+            if next_end >= 0:
+                quotes += file[end + 1:next_end + 1].count(b'"')
+            end = next_end
+        
+        if end < 0:
+            end = size
+        else:
+            end += 1
+        
+        yield start, end
+        start = end
+
+QUOTED_CELL = re.compile(rb'(?:\A|(?<=[,\r\n]))"[^"]*(?:""[^"]*)*"?')
+"""Quoted part of a cell, the way `csv.reader` reads it. A quote only starts
+a quoted cell at the start of a cell, `""` is an escaped quote, and a quote
+anywhere else is part of the cell."""
+
+def ends_row(file: "mmap.mmap | bytes", start: int, end: int) -> bool:
+    """Check that a chunk from `split_csv()` ends at the end of a row.
+
+    Args:
+        file (mmap.mmap | bytes): Contents of the file.
+        start (int): Start of the chunk. Has to be the start of a row.
+        end (int): End of the chunk.
+
+    Returns:
+        bool: whether the newline the chunk ends with is outside quoted cells
+    """
+    if end >= len(file) or file.find(b'"', start, end) < 0:
+        return True
+    
+    for match in QUOTED_CELL.finditer(file, start):
+        if match.start() >= end:
+            break
+        if match.end() >= end:
+            return False
+    
+    return True
+
+def _read_chunk(path: str, start: int, end: int, encoding: str) -> list[list[str]] | None:
+    # None if the chunk doesn't end at the end of a row
+    import mmap
+    
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as contents:
+        if not ends_row(contents, start, end):
+            return None
+        text = contents[start:end].decode(encoding)
+    
+    return list(map(minify_row, csv.reader(io.StringIO(text, newline = ''))))
+
+def _read_csv_from(path: str, start: int, encoding: str) -> Iterator[list[str]]:
+    with open(path, 'rb') as file:
+        file.seek(start)
+        with io.TextIOWrapper(file, encoding, newline = '') as text:
+            yield from map(minify_row, csv.reader(text))
+
+def _read_chunks(path: str, chunks: Iterable[tuple[int, int]], encoding: str, workers: int | None) -> Generator[list[str], None, int | None]:
+    # returns the start of the first chunk that doesn't end at the end of a row
+    from collections import deque
+    # imported here, since it imports multiprocessing, which is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    
+    executor = None
+    max_pending = (workers or os.cpu_count() or 1) * 2
+    try:
+        pending = deque()
+        for chunk in chunks:
+            if executor == None:
+                executor = ProcessPoolExecutor(max_workers = workers)
+            
+            pending.append((chunk[0], executor.submit(_read_chunk, path, *chunk, encoding)))
+            if len(pending) >= max_pending:
+                start, future = pending.popleft()
+                rows = future.result()
+                if rows == None:
+                    return start
+                yield from rows
+        
+        while pending:
+            start, future = pending.popleft()
+            rows = future.result()
+            if rows == None:
+                return start
+            yield from rows
+    finally:
+        if executor != None:
+            executor.shutdown(cancel_futures = True)
+    
+    return None
+
+def read_csv_parallel(path: str, encoding: str | None = None, workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> Iterator[list[str]]:
+    """Read a csv file in a process pool, in order.
     
-    return minify_table(table)
+    The file is memory mapped and split into chunks of rows (see
+    `split_csv()`), which are checked, parsed and stripped in separate
+    processes. The first chunk is parsed in this process, so reading only the
+    header doesn't start the pool. Only a few chunks are kept in memory at a
+    time.
+    
+    If a chunk doesn't end at the end of a row, because of a quote inside an
+    unquoted cell, the rest of the file is read in this process, from the
+    start of that chunk. Files in encodings that can't be split safely (like
+    utf-16) are read in this process.
+
+    Args:
+        path (str): Path to the csv file.
+        encoding (str | None, optional): Encoding of the file. Detected if not given. Defaults to None.
+        workers (int | None, optional): Number of processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): Size of each chunk in bytes. Defaults to CHUNK_SIZE.
+
+    Yields:
+        list[str]: rows
+    """
+    encoding = get_encoding(path, encoding)
+    
+    # a bom is fine, since it's only at the start of the first chunk
+    if not '\r\n",'.encode(encoding).endswith(b'\r\n",') or os.path.getsize(path) == 0:
+        yield from _read_csv_from(path, 0, encoding)
+        return
+    
+    import mmap
+    
+    restart = None
+    
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as contents:
+        chunks = split_csv(contents, chunk_size)
+        
+        first = next(chunks, None)
+        if first == None:
+            return
+        
+        rows = _read_chunk(path, *first, encoding)
+        if rows == None:
+            restart = first[0]
+        else:
+            yield from rows
+            restart = yield from _read_chunks(path, chunks, encoding, workers)
+    
+    if restart != None:
+        yield from _read_csv_from(path, restart, encoding)
+
+def load_csv(csv_file: str | IO, encoding: str | None = None, workers: int | None = None) -> list[list[str | None]]:
+    source = CSVSource(csv_file, encoding, workers)
+    try:
+        return list(source)
+    except:
+        e = TypeError('input is not a csv')
+        e.add_note(str(csv_file))
+        raise e
 
 def isnumeric(value: str):
     try:
@@ -107,26 +328,135 @@ def escape_cell(cell: str, dialect: csv.Dialect = csv.excel):
     
 
 def minify_table(table: list[list[str]]):
-    return [[str(cell).strip() if cell != None else cell for cell in row] for row in table]
+    return [minify_row(row) for row in table]
+
+def minify_row(row: list[str]):
+    return [str(cell).strip() if cell != None else cell for cell in row]
 
 def aligned_csv(table: list[list[str]], **kwargs):
-    writer = csv.writer(io.StringIO(), **kwargs)
-    dialect = writer.dialect
+    file = io.StringIO()
+    write_aligned_csv(minify_table(table), file, **kwargs)
+    return file.getvalue()
+
+def compile_escape_cell(dialect: csv.Dialect = csv.excel) -> Callable[[str], str]:
+    """Get a function that does the same as `escape_cell()` with this dialect.
     
-    table = align_table(escape_table(minify_table(table)))
+    With minimal quoting, cells without any special characters are returned
+    as they are, without going through `escape_cell()`.
+
+    Args:
+        dialect (csv.Dialect, optional): dialect. Defaults to csv.excel.
+
+    Returns:
+        Callable[[str], str]: escape function
+    """
+    if dialect.quoting != csv.QUOTE_MINIMAL:
+        return lambda cell: escape_cell(cell, dialect)
     
-    rows = []
+    special = [dialect.delimiter, dialect.quotechar, dialect.lineterminator, dialect.escapechar]
+    special = re.compile('|'.join(re.escape(chars) for chars in special if chars))
     
-    for row in table:
-        rows.append(dialect.delimiter.join([str(cell) for cell in row]).strip())
+    def escape(cell: str) -> str:
+        cell = str(cell)
+        if special.search(cell):
+            return escape_cell(cell, dialect)
+        return cell
+    
+    return escape
+
+def aligned_csv_widths(rows: Iterable[list[str]], dialect: csv.Dialect = csv.excel) -> list[int]:
+    """Get the width of each column of an aligned csv, reading the rows once.
 
-    return '\n'.join(rows)
+    Args:
+        rows (Iterable[list[str]]): rows
+        dialect (csv.Dialect, optional): Dialect used to escape the cells. Defaults to csv.excel.
+
+    Returns:
+        list[int]: column widths, including the space between columns
+    """
+    widths = []
+    escape = compile_escape_cell(dialect)
+    
+    for row in rows:
+        for index, cell in enumerate(row):
+            length = len(escape(cell))
+            if index >= len(widths):
+                widths.append(length)
+            elif length > widths[index]:
+                widths[index] = length
+    
+    return [width + 1 for width in widths]
+
+def write_aligned_csv(
+    rows: Iterable[list[str]] | Callable[[], Iterable[list[str]]],
+    file: IO[str],
+    widths: list[int] | None = None,
+    **kwargs,
+):
+    """Write a csv with its columns lined up, one row at a time.
+    
+    If `widths` is not given, the rows are read twice, once to get the
+    column widths, and once to write them, so only one row is in memory at a
+    time. Numbers are aligned to the right, and everything else to the left.
+    Cells are written as they are, so strip them first (`CSVSource` already
+    does).
+
+    Args:
+        rows (Iterable[list[str]] | Callable[[], Iterable[list[str]]]): Rows to write, like a list or `CSVSource`. If it can only be iterated once, pass a function that re-opens it, or pass `widths`.
+        file (IO[str]): File to write to.
+        widths (list[int] | None, optional): Column widths, from `aligned_csv_widths()`. Defaults to None.
+        **kwargs: Dialect and formatting parameters, the same as `csv.writer()`.
+    """
+    dialect = csv.writer(io.StringIO(), **kwargs).dialect
+    
+    if callable(rows):
+        get_rows = rows
+    else:
+        if widths == None and iter(rows) is rows:
+            raise TypeError('rows can only be read once, pass a function that returns the rows, or the column widths')
+        get_rows = lambda: rows
+    
+    if widths == None:
+        widths = aligned_csv_widths(get_rows(), dialect)
+    if not widths:
+        return
+    
+    delimiter = dialect.delimiter
+    escape = compile_escape_cell(dialect)
+    separator = ''
+    
+    for row in get_rows():
+        cells = []
+        for cell, width in zip(row, widths):
+            cell = escape(cell)
+            if isnumeric(cell):
+                cells.append(cell.rjust(width))
+            else:
+                cells.append(cell.ljust(width))
+        
+        # short rows are filled with empty cells
+        for width in widths[len(cells):]:
+            cells.append(' ' * width)
+        
+        file.write(separator)
+        file.write(delimiter.join(cells).strip())
+        separator = '\n'
 
 if __name__ == "__main__":
+    import shutil
+    import tempfile
+    
     args = sys.argv[1::]
+    
+    workers = None
+    for flag in ['-w', '--workers']:
+        if flag in args:
+            index = args.index(flag)
+            workers = int(args[index + 1])
+            del args[index:index + 2]
 
     if len(args) < 1:
-        print("usage: align_csv.py <input> <output>")
+        print("usage: align_csv.py <input> <output> [--workers N]")
         exit()
     
     input = args[0]
@@ -134,10 +464,22 @@ if __name__ == "__main__":
     if len(args) > 1:
         output = args[1]
     
-    encoding = charset_normalizer.from_path(input,).best().encoding
-    
-    with open(input, 'r', newline = '', encoding = encoding) as file:
-        table = list(csv.reader(file))
+    encoding = get_encoding(input)
+    source = CSVSource(input, encoding, workers)
     
-    with open(output, 'w', encoding = encoding) as file:
-        file.write(aligned_csv(table))
+    if os.path.abspath(output) != os.path.abspath(input):
+        with open(output, 'w', encoding = encoding) as file:
+            write_aligned_csv(source, file)
+    else:
+        # the input is read twice while writing, so write to a temporary
+        # file and move it into place after
+        with tempfile.NamedTemporaryFile(
+            'w',
+            dir = os.path.dirname(os.path.abspath(output)),
+            encoding = encoding,
+            delete = False,
+        ) as file:
+            write_aligned_csv(source, file)
+        
+        shutil.copymode(input, file.name)
+        os.replace(file.name, output)
@@ -0,0 +1,121 @@
+import codecs
+import os
+from collections import OrderedDict
+
+SAMPLE_SIZE = 64 * 1024
+CACHE_SIZE = 1024
+
+BOMS = [
+    # utf-32 has to be checked before utf-16, since the utf-32-le bom starts with the utf-16-le bom
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+class EncodingResolver():
+    """Finds the encoding of files.
+
+    Only the first `sample_size` bytes are looked at. Files starting with a
+    BOM, or that are valid utf-8, skip charset detection. Results are cached
+    by path, modification time and size, so unchanged files are only
+    detected once.
+
+    Subclass this and override `detect()` to change how the encoding is
+    detected, then pass it to `set_encoding_resolver()`.
+    """
+    def __init__(self, sample_size: int = SAMPLE_SIZE, cache_size: int = CACHE_SIZE) -> None:
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self.cache: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+
+    def resolve(self, path: str, encoding: str | None = None) -> str:
+        """Get the encoding of a file.
+
+        Args:
+            path (str): Path to the file.
+            encoding (str | None, optional): Encoding to use instead of detecting it. Defaults to None.
+
+        Returns:
+            str: encoding
+        """
+        if encoding:
+            return encoding
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        with open(path, 'rb') as file:
+            sample = file.read(self.sample_size)
+
+        encoding = self.detect(sample, complete = len(sample) < self.sample_size)
+
+        self.cache[key] = encoding
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+
+        return encoding
+
+    def detect(self, sample: bytes, complete: bool = True) -> str:
+        """Detect the encoding of the start of a file.
+
+        Args:
+            sample (bytes): Start of the file.
+            complete (bool, optional): Whether the sample is the whole file. If not, it may end part way through a character. Defaults to True.
+
+        Returns:
+            str: encoding
+        """
+        for bom, encoding in BOMS:
+            if sample.startswith(bom):
+                return encoding
+
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final = complete)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        # imported here so importing md_generator stays fast
+        import charset_normalizer
+        
+        best = charset_normalizer.from_bytes(sample).best()
+        if best == None:
+            return 'utf-8'
+        return best.encoding
+
+    def cache_clear(self):
+        self.cache.clear()
+
+resolver = EncodingResolver()
+
+def set_encoding_resolver(new_resolver: EncodingResolver):
+    """Set the resolver used by `get_encoding()`.
+
+    Args:
+        new_resolver (EncodingResolver): resolver
+    """
+    global resolver
+
+    if not isinstance(new_resolver, EncodingResolver):
+        raise TypeError('resolver must be EncodingResolver')
+
+    resolver = new_resolver
+
+def get_encoding(path: str, encoding: str | None = None) -> str:
+    """Get the encoding of a file, using the current resolver.
+
+    Args:
+        path (str): Path to the file.
+        encoding (str | None, optional): Encoding to use instead of detecting it. Defaults to None.
+
+    Returns:
+        str: encoding
+    """
+    return resolver.resolve(path, encoding)
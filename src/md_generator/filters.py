@@ -0,0 +1,88 @@
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable
+
+NUMERIC_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+def compile_predicate(rule: Any) -> Callable[[Any], bool]:
+    """Turn a filter rule into a function that checks a cell.
+
+    Rules can be:
+    - a string expression (see `parse_predicate()`)
+    - a compiled regex, which has to match the start of the cell
+    - a set, list or tuple of values the cell has to be in
+    - a number the cell has to be equal to
+    - a function that takes the cell and returns a bool
+
+    Args:
+        rule (Any): filter rule
+
+    Returns:
+        Callable[[Any], bool]: predicate
+    """
+    if isinstance(rule, re.Pattern):
+        return lambda cell: rule.match(str(cell)) != None
+    elif isinstance(rule, (set, frozenset, list, tuple)):
+        values = frozenset(str(value) for value in rule)
+        return lambda cell: str(cell) in values
+    elif isinstance(rule, (int, float)) and not isinstance(rule, bool):
+        return _numeric(operator.eq, rule)
+    elif callable(rule):
+        return rule
+
+    return parse_predicate(str(rule))
+
+@lru_cache(maxsize = 1024)
+def parse_predicate(expression: str) -> Callable[[Any], bool]:
+    """Parse a filter expression.
+
+    `value` the cell is equal to `value`
+    `!rule` the cell does not match `rule`
+    `~regex` the regex matches the start of the cell
+    `>n`, `>=n`, `<n`, `<=n` the cell is a number compared with `n`
+    `(a,b,c)` or `[a,b,c]` the cell is one of the values
+
+    In a `Table` format spec, expressions come after the column, like
+    `filter=a=>=9`.
+
+    Args:
+        expression (str): filter expression
+
+    Returns:
+        Callable[[Any], bool]: predicate
+    """
+    if expression.startswith('!'):
+        predicate = parse_predicate(expression[1:])
+        return lambda cell: not predicate(cell)
+
+    if expression.startswith('~'):
+        pattern = re.compile(expression[1:])
+        return lambda cell: pattern.match(str(cell)) != None
+
+    for symbol, compare in NUMERIC_OPERATORS.items():
+        if expression.startswith(symbol):
+            try:
+                return _numeric(compare, float(expression[len(symbol):]))
+            except ValueError:
+                break
+
+    if len(expression) >= 2 and expression[0] + expression[-1] in ['()', '[]']:
+        values = frozenset(value.strip() for value in expression[1:-1].split(','))
+        return lambda cell: str(cell) in values
+
+    return lambda cell: str(cell) == expression
+
+def _numeric(compare: Callable[[float, float], bool], number: float) -> Callable[[Any], bool]:
+    def predicate(cell: Any) -> bool:
+        try:
+            return compare(float(cell), number)
+        except (TypeError, ValueError):
+            return False
+
+    return predicate
@@ -1,11 +1,15 @@
 import re
 from typing import TYPE_CHECKING, Callable, Any, Mapping
-from copy import deepcopy
+from functools import lru_cache
 import string
+import _string
 import os
-from collections.abc import Sequence
+import stat
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Sequence
+import itertools
 
-import charset_normalizer
+from .encoding import get_encoding
 
 from .utils import escape, strnum
 
@@ -29,8 +33,7 @@ class EscapeFormat():
         result = self.key
         if spec.lower() == "fftext":
             result = str(result)
-            escape_chars = r'\:"()[]'
-            result = re.sub(f'([{re.escape(escape_chars)}])', r'\\\1', result)
+            result = escape(result, ':"()[]')
             result = result.replace("'", r"'\\\''")
         else:
             result = self.key.__format__(spec)
@@ -141,19 +144,141 @@ class KeyValue():
         if name in dir(self.value):
             return getattr(self.value, name)
 
+INCLUDE_CACHE_SIZE = 32 * 1024 * 1024
+
+class IncludeCache():
+    """Cache of the contents of included files.
+    
+    Files are keyed by their resolved path, and re-read when their
+    modification time or size changes. The least recently used files are
+    dropped once the total size of the cached files is over `max_size`
+    characters.
+    """
+    def __init__(self, max_size: int = INCLUDE_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.files: OrderedDict[tuple[str, str | None], tuple[int, int, str]] = OrderedDict()
+    
+    def read(self, path: str, encoding: str | None = None) -> str | None:
+        """Get the contents of a file.
+
+        Args:
+            path (str): Path to the file.
+            encoding (str | None, optional): Encoding of the file. Detected if not given. Defaults to None.
+
+        Returns:
+            str | None: file contents, or None if it is not a file
+        """
+        path = os.path.realpath(path)
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+        
+        key = (path, encoding)
+        cached = self.files.get(key)
+        if cached != None and cached[0] == file_stat.st_mtime_ns and cached[1] == file_stat.st_size:
+            self.files.move_to_end(key)
+            return cached[2]
+        
+        with open(path, 'r', newline = '', encoding = get_encoding(path, encoding)) as file:
+            contents = file.read()
+        
+        self._remove(key)
+        if len(contents) <= self.max_size:
+            self.files[key] = (file_stat.st_mtime_ns, file_stat.st_size, contents)
+            self.size += len(contents)
+            
+            while self.size > self.max_size:
+                self._remove(next(iter(self.files)))
+        
+        return contents
+    
+    def invalidate(self, path: str | None = None):
+        """Remove a file from the cache, so it is read again next time.
+
+        Args:
+            path (str | None, optional): Path to the file. If None, all files are removed. Defaults to None.
+        """
+        if path == None:
+            self.files.clear()
+            self.size = 0
+            return
+        
+        path = os.path.realpath(path)
+        for key in [key for key in self.files if key[0] == path]:
+            self._remove(key)
+    
+    def _remove(self, key: tuple[str, str | None]):
+        cached = self.files.pop(key, None)
+        if cached != None:
+            self.size -= len(cached[2])
+
 class MDFormatter(string.Formatter):
     COMPONENTS = {}
+    INCLUDES = IncludeCache()
     
-    def __init__(self, base_dir = '.') -> None:
+    def __init__(self, base_dir = '.', encoding: str | None = None, includes: IncludeCache | None = None) -> None:
         self.base_dir = base_dir
+        self.encoding = encoding
+        if includes != None:
+            self.includes = includes
+        else:
+            self.includes = self.INCLUDES
         super().__init__()
     
-    def vformat(self, format_string, args, kwargs):
+    def vformat(self, format_string: "str | CompiledTemplate", args, kwargs):
         used_args = set()
         result, _ = self._vformat(format_string, args, kwargs, used_args, 99) # I want a large recursive limit
         self.check_unused_args(used_args, args, kwargs)
         return result
     
+    def _vformat(self, format_string: "str | CompiledTemplate", args, kwargs, used_args, recursion_depth, auto_arg_index = 0):
+        # same as string.Formatter._vformat, but runs on a compiled template
+        # so the template string isn't re-parsed on every call
+        if recursion_depth < 0:
+            raise ValueError('Max string recursion exceeded')
+        
+        if not isinstance(format_string, CompiledTemplate):
+            format_string = compile_template(format_string)
+        
+        result = []
+        for literal_text, field_name, conversion, format_spec in format_string.parts:
+            if literal_text:
+                result.append(literal_text)
+            
+            if field_name is None:
+                continue
+            
+            if field_name == '':
+                if auto_arg_index is False:
+                    raise ValueError('cannot switch from manual field specification to automatic field numbering')
+                field_name = str(auto_arg_index)
+                auto_arg_index += 1
+            elif field_name.isdigit():
+                if auto_arg_index:
+                    raise ValueError('cannot switch from manual field specification to automatic field numbering')
+                auto_arg_index = False
+            
+            obj, arg_used = self.get_field(field_name, args, kwargs)
+            used_args.add(arg_used)
+            
+            obj = self.convert_field(obj, conversion)
+            
+            if isinstance(format_spec, CompiledTemplate):
+                format_spec, auto_arg_index = self._vformat(
+                    format_spec, args, kwargs,
+                    used_args, recursion_depth - 1,
+                    auto_arg_index = auto_arg_index,
+                )
+            
+            result.append(self.format_field(obj, format_spec))
+        
+        return ''.join(result), auto_arg_index
+    
     @classmethod
     def register_component(cls, name: str, component: "BaseNode | Callable[[str], BaseNode]"):
         if not isinstance(name, str):
@@ -163,16 +288,21 @@ class MDFormatter(string.Formatter):
     
     def get_field(self, field_name: str, args: Sequence[Any], kwargs: Mapping[str, Any]) -> Any:
         try:
-            value, key = super().get_field(field_name, args, kwargs)
-            return KeyValue(field_name, value), key
+            first, rest = split_field_name(field_name)
+            value = self.get_value(first, args, kwargs)
+            for is_attr, index in rest:
+                if is_attr:
+                    value = getattr(value, index)
+                else:
+                    value = value[index]
+            return KeyValue(field_name, value), first
         except:
-            if field_name.startswith('[') and field_name.endswith(']') and os.path.isfile(os.path.join(self.base_dir, field_name[1:-1])):
-                contents = field_name[1:-1]
-                file = charset_normalizer.from_path(os.path.join(self.base_dir, field_name[1:-1])).best()
-                contents = file.output().decode()
-                return KeyValue(field_name, FileContents(contents)), field_name
-            else:
-                return KeyValue(field_name, MissingKey(field_name)), field_name
+            if field_name.startswith('[') and field_name.endswith(']'):
+                contents = self.includes.read(os.path.join(self.base_dir, field_name[1:-1]), self.encoding)
+                if contents != None:
+                    return KeyValue(field_name, FileContents(contents)), field_name
+            
+            return KeyValue(field_name, MissingKey(field_name)), field_name
     
     
     def convert_field(self, value, conversion: str | None):
@@ -196,99 +326,216 @@ class MDFormatter(string.Formatter):
         # if isinstance(value, MissingKey):
         #     return f'{{{super().format_field(value, format_spec)}}}'
         
-        result = None
-        
-        old = format_spec
-        split_spec, rest = parse_format_spec_part(format_spec)
-        
-        bracket_level = 0
-        
-        if len(split_spec[0]) > 2 and isinstance(split_spec[0], str) and split_spec[0][0] + split_spec[0][-1] == '{}':
-            bracket_str_num = ''
-            if isinstance(split_spec[0], str):
-                bracket_str_num = split_spec[0][1:-1]
-            else:
-                bracket_str_num = split_spec[0][1]
+        spec = compile_field_spec(format_spec)
             
-            if bracket_str_num.isnumeric():
-                bracket_level = int(bracket_str_num)
-            
-            old = rest
-            split_spec, rest = parse_format_spec_part(rest)
-            
-        if bracket_level > 0:
+        if spec.bracket_level > 0:
             key = str(value)
             conversion = None
             if isinstance(value, KeyValue):
                 key = value.key
                 conversion = value.conversion
             
-            return ('{' * (2 ** (bracket_level - 1))) + key + (f'!{conversion}' if conversion else '') + (f':{old}' if old else '') + '}' * (2 ** (bracket_level - 1))
+            return ('{' * (2 ** (spec.bracket_level - 1))) + key + (f'!{conversion}' if conversion else '') + (f':{spec.spec}' if spec.spec else '') + '}' * (2 ** (spec.bracket_level - 1))
         
         if isinstance(value, KeyValue):
             value = value.value
         
-        if len(split_spec) > 0:
-            for part in split_spec:
-                if isinstance(part, str):
-                    component_name = part.lower()
-                    if component_name in self.COMPONENTS:
-                        component = self.COMPONENTS[component_name](value)
-                        result = super().format_field(component, rest)
-                        break
-                    elif part in ['n', 'num']:
-                        print('is num', type(value))
-                        value = strnum(value)
-                    else:
-                        result = super().format_field(value, old)
-                        break
-                elif isinstance(part, tuple):
-                    component_name = part[0].lower()
-                    if component_name in self.COMPONENTS:
-                        args = []
-                        kwargs = {}
-                        
-                        if isinstance(part[1], str):
-                            args.append(part[1])
-                        else:
-                            for arg in part[1]:
-                                if isinstance(arg, str):
-                                    args.append(arg)
-                                elif isinstance(arg, list):
-                                    kwargs[arg[0]] = arg[1]
-                        
-                        component = self.COMPONENTS[component_name](value, *args, **kwargs)
-                        result = super().format_field(component, rest)
-                        break
-                    else:
-                        result = super().format_field(value, old)
-                        break
-            
-                old = rest
-                split_spec, rest = parse_format_spec_part(rest)
+        component = self.COMPONENTS.get(spec.name.lower())
         
-        if result == None:
-            result = super().format_field(value, old)
+        if component is not None:
+            result = super().format_field(component(value, *spec.args, **spec.kwargs), spec.rest)
+        elif spec.is_num:
+            value = strnum(value)
+            result = super().format_field(value, spec.rest)
+        else:
+            result = super().format_field(value, spec.spec)
         
         if hasattr(value, 'conversion') and value.conversion:
             result = super().convert_field(result, value.conversion)
         
         return result
 
-def md_format(string: str, *args, **values: dict[str,str]):
+class CompiledTemplate():
+    """Template that has already been parsed into literal text and fields.
+    
+    Use `compile_template()` to get one, which caches them.
+    """
+    template: str
+    parts: list[tuple[str, str | None, str | None, "str | CompiledTemplate"]]
+    
+    def __init__(self, template: str) -> None:
+        self.template = str(template)
+        self.parts = []
+        
+        for literal_text, field_name, format_spec, conversion in _string.formatter_parser(self.template):
+            if format_spec and '{' in format_spec:
+                # nested fields have to be formatted every time
+                format_spec = compile_template(format_spec)
+            
+            self.parts.append((literal_text, field_name, conversion, format_spec))
+    
+    def format(self, *args, **values) -> str:
+        return md_format(self, *args, **values)
+    
+    def __str__(self) -> str:
+        return self.template
+    
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.template!r})'
+
+class FieldSpec():
+    """Parsed format spec of a single field, as used by `MDFormatter.format_field`."""
+    bracket_level: int
+    spec: str
+    name: str
+    args: tuple
+    kwargs: dict[str, str]
+    rest: str
+    is_num: bool
+    
+    def __init__(self, format_spec: str) -> None:
+        self.bracket_level = 0
+        self.spec = format_spec
+        
+        split_spec, rest = parse_format_spec_part(format_spec)
+        part = split_spec[0]
+        
+        if isinstance(part, str) and len(part) > 2 and part[0] + part[-1] == '{}':
+            if part[1:-1].isnumeric():
+                self.bracket_level = int(part[1:-1])
+            
+            self.spec = rest
+            split_spec, rest = parse_format_spec_part(rest)
+            part = split_spec[0]
+        
+        self.rest = rest
+        
+        args = []
+        kwargs = {}
+        
+        if isinstance(part, tuple):
+            self.name = part[0]
+            self.is_num = False
+            
+            if isinstance(part[1], str):
+                args.append(part[1])
+            else:
+                for arg in part[1]:
+                    if isinstance(arg, str):
+                        args.append(arg)
+                    elif isinstance(arg, list):
+                        kwargs[arg[0]] = arg[1]
+        else:
+            self.name = part
+            self.is_num = part in ['n', 'num']
+        
+        self.args = tuple(args)
+        self.kwargs = kwargs
+
+TEMPLATE_CACHE_SIZE = 1024
+
+@lru_cache(maxsize = TEMPLATE_CACHE_SIZE)
+def compile_template(template: str) -> CompiledTemplate:
+    """Parse a template once, so it can be formatted many times.
+    
+    Compiled templates are kept in an LRU cache keyed by the template string,
+    so calling this again with the same template is cheap.
+
+    Args:
+        template (str): template string, in the same format as `md_format()`
+
+    Returns:
+        CompiledTemplate: compiled template
+    """
+    return CompiledTemplate(template)
+
+@lru_cache(maxsize = TEMPLATE_CACHE_SIZE)
+def compile_field_spec(format_spec: str) -> FieldSpec:
+    return FieldSpec(format_spec)
+
+@lru_cache(maxsize = TEMPLATE_CACHE_SIZE)
+def split_field_name(field_name: str) -> tuple[str | int, tuple[tuple[bool, str | int], ...]]:
+    first, rest = _string.formatter_field_name_split(field_name)
+    return first, tuple(rest)
+
+def md_format(string: "str | CompiledTemplate", *args, **values: dict[str,str]):
     dir = '.'
     if len(args) > 0:
         dir = args[0]
     
     for key in values:
+        values[key] = coerce_value(values[key])
+    return MDFormatter(dir).vformat(string, (), values)
+
+def coerce_value(value: Any) -> Any:
+    try:
+        return int(value)
+    except:
         try:
-            values[key] = int(values[key])
+            return float(value)
         except:
-            try:
-                values[key] = float(values[key])
-            except:
-                pass
-    return MDFormatter(dir).format(string, **values)
+            return value
+
+class RowFields(Mapping):
+    """Read only mapping of column names to the cells in a row.
+    
+    Cells are looked up by position, and converted to numbers (like
+    `md_format()` does) only when a template uses them.
+    """
+    def __init__(self, indexes: dict[str, int], row: list[Any]) -> None:
+        self.indexes = indexes
+        self.row = row
+    
+    def __getitem__(self, key: str) -> Any:
+        return coerce_value(self.row[self.indexes[key]])
+    
+    def __iter__(self):
+        return iter(self.indexes)
+    
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+class RowFormatter():
+    """Formats column templates for many rows.
+    
+    Each template is compiled once, and one formatter is used for every row.
+    Templates are applied in order, so later templates see the output of
+    earlier ones.
+    """
+    def __init__(self, header: list[str], templates: dict[str, str], base_dir = '.') -> None:
+        self.header = list(header)
+        self.indexes = {name: index for index, name in enumerate(self.header)}
+        self.templates = [
+            (self.indexes[key], compile_template(template))
+            for key, template in templates.items()
+            if key in self.indexes
+        ]
+        self.formatter = MDFormatter(base_dir)
+    
+    def format_row(self, row: list[Any]) -> list[Any]:
+        row = list(row)
+        fields = RowFields(self.indexes, row)
+        
+        for index, template in self.templates:
+            row[index] = self.formatter.vformat(template, (), fields)
+        
+        return row
+    
+    def format_rows(self, rows: Iterable[list[Any]]) -> Iterator[list[Any]]:
+        return map(self.format_row, rows)
+    
+    def format_chunks(self, rows: Iterable[list[Any]], chunk_size: int = 1024) -> Iterator[list[list[Any]]]:
+        """Format rows in chunks.
+
+        Args:
+            rows (Iterable[list[Any]]): rows
+            chunk_size (int, optional): Number of rows in each chunk. Defaults to 1024.
+
+        Yields:
+            list[list[Any]]: formatted rows
+        """
+        for chunk in itertools.batched(rows, chunk_size):
+            yield [self.format_row(row) for row in chunk]
 
 def parse_format_spec(format_spec: str):
     """
@@ -303,14 +550,19 @@ def parse_format_spec(format_spec: str):
     
     """
     
+    return [_thaw_spec_item(item) for item in parse_format_spec_frozen(format_spec)]
+
+@lru_cache(maxsize = TEMPLATE_CACHE_SIZE)
+def parse_format_spec_frozen(format_spec: str) -> tuple:
+    """Same as `parse_format_spec()`, but the result is cached, and made of tuples instead of lists, so it can't be changed."""
     result = []
     rest = format_spec
     
     while rest != '':
-        new, rest = parse_format_spec_part(rest)
-        result.extend(new)
+        item, rest = parse_format_spec_part_frozen(rest)
+        result.append(item)
     
-    return result
+    return tuple(result)
 
 
 def parse_format_spec_part(format_spec: str) -> tuple[list, str]:
@@ -322,102 +574,135 @@ def parse_format_spec_part(format_spec: str) -> tuple[list, str]:
     Returns:
         tuple[list, str]: (parsed, rest)
     """
-    index = -1
-    result = []
-    character = lambda peek = 0: format_spec[index + peek] if (index + peek) < len(format_spec) else ''
+    item, rest = parse_format_spec_part_frozen(format_spec)
+    return [_thaw_spec_item(item)], rest
+
+def _thaw_spec_item(item):
+    if isinstance(item, tuple):
+        return (item[0], _thaw_spec_value(item[1]))
+    return item
+
+def _thaw_spec_value(value):
+    if isinstance(value, tuple):
+        return [_thaw_spec_value(part) for part in value]
+    return value
+
+def _freeze_spec_value(value):
+    if isinstance(value, list):
+        return tuple(_freeze_spec_value(part) for part in value)
+    return value
+
+_QUOTES = ['"', "'"]
+_BRACKETS = {'(': ')', '{': '}', '[': ']', '<': '>'}
+
+# runs of characters that can't change the state of the parser
+_PLAIN_RUN = re.compile(r"""(?:[^\\'"r(\[{<)\]}>:=,]|r(?!['"]))+""")
+_BRACKET_RUN = re.compile(r"""(?:[^\\'"r(\[{<)\]}>]|r(?!['"]))+""")
+_QUOTED_RUN = {
+    '"': re.compile(r'[^\\"]+'),
+    "'": re.compile(r"[^\\']+"),
+}
+
+@lru_cache(maxsize = TEMPLATE_CACHE_SIZE)
+def parse_format_spec_part_frozen(format_spec: str) -> tuple[str | tuple, str]:
+    """Same as `parse_format_spec_part()`, but the result is cached, and made of tuples instead of lists, so it can't be changed.
+
+    Args:
+        format_spec (str): format spec
+
+    Returns:
+        tuple[str | tuple, str]: (parsed item, rest)
+    """
+    length = len(format_spec)
+    index = 0
+    rest = ''
     
     key = ''
-    value: list[str] = []
-    
-    def get_section_item():
-        item = key
-        
-        section_value = deepcopy(value)
-        
-        if len(section_value) > 0:
-            item = (key, section_value[0] if len(section_value) == 1 and isinstance(section_value[0], str) else section_value)
-        
-        return item
-    
-    def is_empty_value():
-        if key == '':
-            return True
-        elif len(value) == 0:
-            return True
-        elif isinstance(value[-1], str) and value[-1] == '':
-            return True
-        elif isinstance(value[-1], list) and len(value[-1]) > 0 and value[-1][-1] == '':
-            return True
-        
-        return False
-    
-    mode = 'key'
+    value: list[str | list] = []
+    value_mode = False
     
     quote_char = ''
     raw_escape = False
     
     brackets = []
     
-    while index < len(format_spec):
-        index += 1
-        char = character()
+    while index < length:
+        if quote_char:
+            run = _QUOTED_RUN[quote_char].match(format_spec, index)
+        elif brackets:
+            run = _BRACKET_RUN.match(format_spec, index)
+        else:
+            run = _PLAIN_RUN.match(format_spec, index)
         
-        if character() == '\\':
-            index += 1
-            if raw_escape:
-                char = f'\\{character()}'
-        elif quote_char:
-            if character() == quote_char:
-                raw_escape = False
-                quote_char = ''
-                continue
-        elif is_empty_value() and character() == 'r' and character(1) in ["'", '"']:
-            raw_escape = True
-            quote_char = character(1)
-            index += 1
-            continue
-        elif is_empty_value() and character() and character() in ["'", '"']:
-            raw_escape = False
-            quote_char = character()
-            continue
-        elif character() and character() in ['(','{','[','<']:
-            # if character() == '[' and ']' not in brackets:
-            #     brackets.append(']')
-            #     char = '{'
-            # else:
-            #     print('char', character())
-            brackets.append({'(': ')', '{': '}', '[': ']', '<': '>'}[character()])
-        elif len(brackets):
-            if character() == brackets[-1]:
-                brackets.pop()
-                # if ']' not in brackets:
-                #     char = '}'
-        elif character() == ':':
-            mode = 'key'
-            break
-        elif mode == 'key':
-            if character() == '=':
-                mode = 'value'
-                value.append('')
-                continue
-        elif mode == 'value':
-            if character() == '=':
-                value[-1] = [value[-1], '']
+        if run:
+            text = run.group()
+            index = run.end()
+        else:
+            char = format_spec[index]
+            next_char = format_spec[index + 1] if index + 1 < length else ''
+            text = char
+            
+            if value_mode:
+                last = value[-1]
+                empty = key == '' or ((last == '') if isinstance(last, str) else (len(last) > 0 and last[-1] == ''))
+            else:
+                empty = True
+            
+            if char == '\\':
+                # the escaped character is skipped, and only kept in raw strings
+                index += 2
+                if raw_escape:
+                    text = f'\\{next_char}'
+            elif quote_char:
+                index += 1
+                if char == quote_char:
+                    raw_escape = False
+                    quote_char = ''
+                    continue
+            elif empty and char == 'r' and next_char in _QUOTES:
+                raw_escape = True
+                quote_char = next_char
+                index += 2
                 continue
-            elif character() == ',':
-                value.append('')
+            elif empty and char in _QUOTES:
+                raw_escape = False
+                quote_char = char
+                index += 1
                 continue
-            
-        if mode == 'key':
-            key += char
-        elif mode == 'value':
-            if len(value) == 0:
-                value.append('')
-            if isinstance(value[-1], str):
-                value[-1] += char
-            elif isinstance(value[-1], list):
-                value[-1][-1] += char
-    
-    result.append(get_section_item())
-    
-    return result, format_spec[index + 1::]
+            elif char in _BRACKETS:
+                brackets.append(_BRACKETS[char])
+                index += 1
+            elif brackets:
+                if char == brackets[-1]:
+                    brackets.pop()
+                index += 1
+            elif char == ':':
+                rest = format_spec[index + 1:]
+                break
+            elif not value_mode:
+                index += 1
+                if char == '=':
+                    value_mode = True
+                    value.append('')
+                    continue
+            else:
+                index += 1
+                if char == '=':
+                    value[-1] = [value[-1], '']
+                    continue
+                elif char == ',':
+                    value.append('')
+                    continue
+        
+        if not value_mode:
+            key += text
+        elif isinstance(value[-1], str):
+            value[-1] += text
+        else:
+            value[-1][-1] += text
+    
+    item = key
+    if len(value) > 0:
+        item = (key, value[0] if len(value) == 1 and isinstance(value[0], str) else _freeze_spec_value(value))
+    
+    return item, rest
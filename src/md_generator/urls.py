@@ -0,0 +1,42 @@
+import re
+from functools import lru_cache
+
+URL_CACHE_SIZE = 4096
+
+# urls that furl gives back unchanged: relative paths made of unreserved and
+# sub-delim characters, with an optional simple fragment. Anything with a
+# scheme, host, query, percent escape or non-ascii character is parsed.
+SAFE_URL = re.compile(
+    r"(?!//)[A-Za-z0-9\-._~!$&'()*+,;=@]*"
+    r"(?:/[A-Za-z0-9\-._~!$&'()*+,;=@:]*)*"
+    r"(?:#[A-Za-z0-9\-._~!$'()*+,;@:/]+)?"
+)
+
+def normalize_url(url: str) -> str:
+    """Normalize a url the same way `str(furl(url))` does.
+
+    Urls that are already safe are returned as is, without parsing them.
+    Others are parsed with furl, and the result is cached.
+
+    Args:
+        url (str): url
+
+    Returns:
+        str: normalized url
+    """
+    if not isinstance(url, str):
+        from furl import furl
+        
+        return str(furl(url))
+    
+    if SAFE_URL.fullmatch(url):
+        return url
+    
+    return _parse_url(url)
+
+@lru_cache(maxsize = URL_CACHE_SIZE)
+def _parse_url(url: str) -> str:
+    # imported here so importing md_generator stays fast
+    from furl import furl
+    
+    return str(furl(url))
@@ -1,17 +1,99 @@
 import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable
+
+ESCAPE_CACHE_SIZE = 256
+REPLACE_CHAR_LIMIT = 12
+
+BACKTICKS = re.compile(r'`+')
 
 def indent(text: str, amount: int = 4, char: str = " "):
     return ''.join([(char * amount) + l for l in text.splitlines(True)])
 
+@lru_cache(maxsize = ESCAPE_CACHE_SIZE)
+def compile_escape(chars: str = '"\'') -> Callable[[str], str]:
+    """Get a function that puts a backslash before `chars` and backslashes.
+
+    A few `str.replace()` calls are faster than `str.translate()` for small
+    sets of characters, so a translation table is only used for large sets.
+
+    Args:
+        chars (str, optional): Characters to escape. Defaults to '"\''.
+
+    Returns:
+        Callable[[str], str]: escape function
+    """
+    chars = ''.join(dict.fromkeys(chars.replace('\\', '')))
+    
+    if len(chars) > REPLACE_CHAR_LIMIT:
+        table = str.maketrans({char: '\\' + char for char in '\\' + chars})
+        return lambda text: text.translate(table)
+    
+    # backslashes have to go first, so the added ones aren't escaped again
+    replacements = [(char, '\\' + char) for char in '\\' + chars]
+    def escape_text(text: str) -> str:
+        for char, replacement in replacements:
+            if char in text:
+                text = text.replace(char, replacement)
+        return text
+    
+    return escape_text
+
 def escape(text: str, chars: str = '"\''):
-    text = str(text)
-    escape_chars = '\\' + chars
-    result = re.sub(f'([{re.escape(escape_chars)}])', r'\\\1', text)
+    return compile_escape(chars)(str(text))
+
+def escape_and_measure(text: str, chars: str = '"\'') -> tuple[str, int]:
+    """Escape text, and get the display width of the escaped text.
 
-    return result
+    Args:
+        text (str): Text to escape.
+        chars (str, optional): Characters to escape. Defaults to '"\''.
+
+    Returns:
+        tuple[str, int]: escaped text, display width
+    """
+    result = compile_escape(chars)(str(text))
+    return result, display_width(result)
+
+@lru_cache(maxsize = 4096)
+def char_width(char: str) -> int:
+    """Get the number of columns a character takes up in a monospace font.
+
+    Wide and fullwidth characters (like CJK and most emoji) take 2 columns,
+    and combining characters take none.
+
+    Args:
+        char (str): character
+
+    Returns:
+        int: width
+    """
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return 0
+    if unicodedata.east_asian_width(char) in ('W', 'F'):
+        return 2
+    return 1
+
+def display_width(text: str) -> int:
+    """Get the number of columns text takes up in a monospace font.
+
+    Args:
+        text (str): text
+
+    Returns:
+        int: width
+    """
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
 
 def backtick_count(text: str, start = 1) -> int:
-    found_ticks = {len(t) for t in re.findall(r"(`+)", str(text))}
+    text = str(text)
+    if '`' not in text:
+        return start
+    
+    found_ticks = {len(t) for t in BACKTICKS.findall(text)}
     
     num_ticks = start
     while num_ticks in found_ticks: